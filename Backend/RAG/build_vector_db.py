@@ -6,27 +6,238 @@ in a ChromaDB vector database. Run this script whenever PDF files are updated.
 
 Usage:
     python build_vector_db.py
+    python build_vector_db.py --watch   # keep the model loaded and rebuild on changes
 """
 
 import os
-import json
+import orjson
 import re
 import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Dict, Optional, Any
+import numpy as np
 import pdfplumber
-from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
 from dotenv import load_dotenv
 
+from services.embedding_cache import EmbeddingCache
+from services.embedding_model import embedding_namespace, load_embedding_model
+
 load_dotenv()
 
+# Read size used when hashing files for change detection
+_HASH_BLOCK_SIZE = 1 << 20
+
+# Max rows per ChromaDB upsert when writing the whole build at once
+_CHROMA_WRITE_BATCH = 1000
+
+# Embed once this many encode batches' worth of extracted rows are buffered
+_ENCODE_FLUSH_BATCHES = 4
+
+# Embedded files that may wait for the NeonDB writer before encoding blocks
+_PIPELINE_QUEUE_SIZE = 4
+
+# HNSW settings for the restaurants collection. Embeddings are stored
+# unit-normalized, so inner product ranks the same as cosine without the norm
+# work. Builds insert everything at once, so keep graph links (M) and
+# construction_ef low, and let chromadb batch index updates and disk syncs.
+# Only applied when the collection is first created.
+_BUILD_HNSW_METADATA = {
+    "hnsw:space": "ip",
+    "hnsw:M": 8,
+    "hnsw:construction_ef": 50,
+    "hnsw:batch_size": _CHROMA_WRITE_BATCH,
+    "hnsw:sync_threshold": 10000
+}
+
+# Lines ending in a price; a page with at least _TABLE_HINT_MIN_ROWS of them
+# is treated as tabular
+_TABLE_HINT_RE = re.compile(r'\d{2,}\s*$', re.MULTILINE)
+_TABLE_HINT_MIN_ROWS = 3
+
+# Per-page cleanup patterns, compiled once instead of looked up on every page
+_CID_RE = re.compile(r'\(cid:\d+\)')
+_SPACED_TEXT_RE = re.compile(r'([A-Za-z]\s){3,}[A-Za-z]')
+_NULL_TABLE = str.maketrans('\x00', ' ')   # NULs -> spaces, collapsed by _HSPACE_RE
+_HSPACE_RE = re.compile(r'[ \t]+')
+_PKR_PRICE_RE = re.compile(r'—\s*pkr\s*\d+')
+_BULLET_LABEL_RE = re.compile(r'•\s+\w+:')
+_SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+_NEWLINE_RE = re.compile(r'\s*\n\s*')
+_NON_SPACE_RE = re.compile(r'\S')
+_SECTION_SPLIT_RE = re.compile(r'\n(?=Restaurant Details|Categories & Identity|Branches & Locations|Menu Categories|Menu Items)')
+
+# Extraction helpers live at module level so they can be pickled into
+# ProcessPoolExecutor workers (the Chroma client is not fork-safe, so all
+# database writes stay in the main process).
+
+def infer_page_type(text: str) -> str:
+    """Infer if the content is 'menu items' or 'general information'"""
+    text_lower = text.lower()
+    
+    # Heuristics for menu
+    menu_score = 0
+    if "|" in text: menu_score += 2 # Table separator
+    # Reward prices, currencies, and menu-specific terms
+    if any(kw in text_lower for kw in ["rs.", "pkr", "price", "menu", "category", "dish", "deal", "calories", "kcal", "marinade", "starter"]):
+        menu_score += 3
+        
+    # Check for price patterns like " 500" or " 1,200" or " — PKR"
+    if _TABLE_HINT_RE.search(text) or _PKR_PRICE_RE.search(text_lower):
+        menu_score += 4
+        
+    # Reward specific menu item markers like "★" or bullet points with descriptions
+    if "★" in text or _BULLET_LABEL_RE.search(text):
+        menu_score += 2
+    
+    # Heuristics for general info
+    info_score = 0
+    if any(kw in text_lower for kw in ["contact", "phone", "email", "address", "location", "branch", "open", "hours", "about us", "founded", "specialties", "identity"]):
+        info_score += 3
+        
+    if any(kw in text_lower for kw in ["cuisine", "keywords", "branches", "est.", "established"]):
+        info_score += 2
+    
+    if menu_score >= info_score:
+        return "menu items"
+    else:
+        return "general information"
+
+
+def _fix_spaced_text(match) -> str:
+    """Collapse letter-spaced runs like 'M E N U' back into 'MENU'"""
+    text = match.group(0)
+    if len(text) > 4 and " " in text:
+        parts = text.split()
+        if all(len(p) == 1 for p in parts if p):
+            return "".join(parts)
+    return text
+
+
+def _extract_page_sections(page, page_num: int) -> List[Dict[str, Any]]:
+    """Extract the tagged sections from a single pdfplumber page"""
+    sections_out = []
+    
+    # Pages with no characters (scanned images, blank separators) have nothing
+    # to extract, so skip every pdfplumber pass for them
+    if not page.chars:
+        return sections_out
+    
+    # Single primary text pass; tables and the layout re-parse are only run
+    # when this text suggests they will add something
+    regular_text = page.extract_text() or ""
+    page_text = ""
+    
+    # Only look for tables when the text has a price column (several lines
+    # ending in numbers); find_tables() skips extract_tables()' text pass
+    if len(_TABLE_HINT_RE.findall(regular_text)) >= _TABLE_HINT_MIN_ROWS:
+        for table in page.find_tables():
+            for row in table.extract():
+                if row:
+                    row_text = " | ".join([str(cell) if cell else "" for cell in row])
+                    if row_text.strip():
+                        page_text += row_text + "\n"
+    
+    if regular_text:
+        if page_text:
+            page_text += "\n" + regular_text
+        else:
+            page_text = regular_text
+    
+    if len(page_text) < 100:
+        layout_text = page.extract_text(layout=True)
+        if layout_text and len(layout_text) > len(page_text):
+            page_text = layout_text
+    
+    if page_text:
+        page_text = _CID_RE.sub('', page_text)
+        page_text = _SPACED_TEXT_RE.sub(_fix_spaced_text, page_text)
+        page_text = page_text.translate(_NULL_TABLE)
+        page_text = _HSPACE_RE.sub(' ', page_text)
+        
+        # Split by major headers to store categories and info separately
+        sections = _SECTION_SPLIT_RE.split(page_text)
+        
+        for section in sections:
+            section = section.strip()
+            if not section: continue
+            
+            # Infer tag based on the starting header
+            if section.startswith("Restaurant Details"):
+                tag = "general information"
+            elif section.startswith("Categories & Identity"):
+                tag = "restaurant identity"
+            elif section.startswith("Branches & Locations"):
+                tag = "location information"
+            elif section.startswith("Menu Categories") or "•" in section:
+                tag = "menu items"  # Per user request, categories are also menu items tag
+            elif section.startswith("Menu Items"):
+                tag = "menu items"
+            else:
+                tag = infer_page_type(section)
+                
+            sections_out.append({
+                "content": section,
+                "page_num": page_num,
+                "type": tag
+            })
+    
+    return sections_out
+
+
+def extract_text_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
+    """Extract text from a PDF file page by page with meta tags"""
+    # Pages are extracted sequentially: pdfplumber is pure Python and holds
+    # the GIL, and build_vector_db already extracts files in parallel across
+    # processes
+    try:
+        pages = []
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages, 1):
+                pages.extend(_extract_page_sections(page, page_num))
+        
+        print(f"✅ Extracted {len(pages)} sections/pages from {os.path.basename(pdf_path)}")
+        return pages
+    
+    except Exception as e:
+        print(f"❌ Error extracting text from {pdf_path}: {e}")
+        return []
+
+
+def _split_spans(text: str, separator: "re.Pattern") -> List[tuple]:
+    """Split text on separator into (start, end) offsets of its non-blank pieces"""
+    # Separators absorb the whitespace around them, so only the outer ends of
+    # the text need trimming and no per-character Python loop is required
+    start = len(text) - len(text.lstrip())
+    end = len(text.rstrip())
+    spans = []
+    for match in separator.finditer(text, start, end):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = match.end()
+    if end > start:
+        spans.append((start, end))
+    return spans
+
+
 class VectorDBBuilder:
-    def __init__(self, data_dir: str = "data", vector_db_dir: str = "vector_db"):
+    def __init__(self, data_dir: str = "data", vector_db_dir: str = "vector_db", embedding_model=None):
         self.data_dir = data_dir
         self.vector_db_dir = vector_db_dir
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # The API server passes in the query-side model so a worker holds one copy
+        self.embedding_model = embedding_model or load_embedding_model()
+        # GPUs stay saturated with much larger batches than CPUs
+        self.encode_batch_size = 256 if self.embedding_model.device.type == 'cuda' else 64
+        os.makedirs(vector_db_dir, exist_ok=True)
+        self.embedding_cache = EmbeddingCache(
+            os.path.join(vector_db_dir, "embedding_cache.sqlite3"),
+            namespace=embedding_namespace(self.embedding_model)
+        )
         
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -38,94 +249,44 @@ class VectorDBBuilder:
         # Using cosine similarity for better semantic matching
         self.restaurant_collection = self.client.get_or_create_collection(
             name="restaurants",
-            metadata={"description": "Restaurant menu and information"},
+            metadata={"description": "Restaurant menu and information", **_BUILD_HNSW_METADATA},
             embedding_function=None  # We'll provide embeddings manually
         )
         self.index_collection = self.client.get_or_create_collection(
             name="restaurant_index",
-            metadata={"description": "Restaurant index and metadata"}
+            metadata={"description": "Restaurant index and metadata", "hnsw:space": "ip"}
         )
         
         print(f"✅ Initialized ChromaDB at {vector_db_dir}")
     
+    def embed(self, contents: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """Embed contents, reusing cached vectors and encoding each new distinct text once"""
+        keys = [self.embedding_cache.key(c) for c in contents]
+        vectors = self.embedding_cache.get_many(keys)
+        
+        # Distinct texts with no cached vector, in first-seen order
+        missing: Dict[bytes, str] = {}
+        for key, content in zip(keys, contents):
+            if key not in vectors and key not in missing:
+                missing[key] = content
+        
+        if missing:
+            encoded = self.embedding_model.encode(
+                list(missing.values()), batch_size=self.encode_batch_size, show_progress_bar=show_progress_bar,
+                convert_to_numpy=True, normalize_embeddings=True
+            )
+            fresh = dict(zip(missing.keys(), encoded))
+            self.embedding_cache.put_many(fresh)
+            vectors.update(fresh)
+        
+        reused = len(contents) - len(missing)
+        if reused:
+            print(f"♻️  Reused {reused}/{len(contents)} embeddings from cache or duplicates")
+        return np.stack([vectors[key] for key in keys]).astype(np.float32)
+    
     def extract_text_from_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
         """Extract text from a PDF file page by page with meta tags"""
-        try:
-            pages = []
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    # Try extracting tables first
-                    tables = page.extract_tables()
-                    page_text = ""
-                    
-                    if tables:
-                        for table in tables:
-                            for row in table:
-                                if row:
-                                    row_text = " | ".join([str(cell) if cell else "" for cell in row])
-                                    if row_text.strip():
-                                        page_text += row_text + "\n"
-                    
-                    regular_text = page.extract_text()
-                    if regular_text:
-                        if page_text:
-                            page_text += "\n" + regular_text
-                        else:
-                            page_text = regular_text
-                    
-                    if not page_text or len(page_text) < 100:
-                        layout_text = page.extract_text(layout=True)
-                        if layout_text and len(layout_text) > len(page_text):
-                            page_text = layout_text
-                    
-                    if page_text:
-                        page_text = re.sub(r'\(cid:\d+\)', '', page_text)
-                        
-                        def fix_spaced_text(match):
-                            text = match.group(0)
-                            if len(text) > 4 and " " in text:
-                                parts = text.split()
-                                if all(len(p) == 1 for p in parts if p):
-                                    return "".join(parts)
-                            return text
-                        
-                        page_text = re.sub(r'([A-Za-z]\s){3,}[A-Za-z]', fix_spaced_text, page_text)
-                        page_text = re.sub(r'\x00+', ' ', page_text)
-                        page_text = re.sub(r'[ \t]+', ' ', page_text)
-                        
-                        # Split by major headers to store categories and info separately
-                        sections = re.split(r'\n(?=Restaurant Details|Categories & Identity|Branches & Locations|Menu Categories|Menu Items)', page_text)
-                        
-                        for section in sections:
-                            section = section.strip()
-                            if not section: continue
-                            
-                            # Infer tag based on the starting header
-                            if section.startswith("Restaurant Details"):
-                                tag = "general information"
-                            elif section.startswith("Categories & Identity"):
-                                tag = "restaurant identity"
-                            elif section.startswith("Branches & Locations"):
-                                tag = "location information"
-                            elif section.startswith("Menu Categories") or "•" in section:
-                                tag = "menu items"  # Per user request, categories are also menu items tag
-                            elif section.startswith("Menu Items"):
-                                tag = "menu items"
-                            else:
-                                tag = self.infer_page_type(section)
-                                
-                            pages.append({
-                                "content": section,
-                                "page_num": page_num,
-                                "type": tag
-                            })
-            
-            print(f"✅ Extracted {len(pages)} sections/pages from {os.path.basename(pdf_path)}")
-            return pages
-        
-        except Exception as e:
-            print(f"❌ Error extracting text from {pdf_path}: {e}")
-            return []
+        return extract_text_from_pdf(pdf_path)
 
     def extract_text_from_txt(self, txt_path: str) -> List[Dict]:
         """Simply read a plain text file as a single page"""
@@ -147,35 +308,7 @@ class VectorDBBuilder:
 
     def infer_page_type(self, text: str) -> str:
         """Infer if the content is 'menu items' or 'general information'"""
-        text_lower = text.lower()
-        
-        # Heuristics for menu
-        menu_score = 0
-        if "|" in text: menu_score += 2 # Table separator
-        # Reward prices, currencies, and menu-specific terms
-        if any(kw in text_lower for kw in ["rs.", "pkr", "price", "menu", "category", "dish", "deal", "calories", "kcal", "marinade", "starter"]):
-            menu_score += 3
-            
-        # Check for price patterns like " 500" or " 1,200" or " — PKR"
-        if re.search(r'\d{2,}\s*$', text, re.MULTILINE) or re.search(r'—\s*pkr\s*\d+', text_lower):
-            menu_score += 4
-            
-        # Reward specific menu item markers like "★" or bullet points with descriptions
-        if "★" in text or re.search(r'•\s+\w+:', text):
-            menu_score += 2
-        
-        # Heuristics for general info
-        info_score = 0
-        if any(kw in text_lower for kw in ["contact", "phone", "email", "address", "location", "branch", "open", "hours", "about us", "founded", "specialties", "identity"]):
-            info_score += 3
-            
-        if any(kw in text_lower for kw in ["cuisine", "keywords", "branches", "est.", "established"]):
-            info_score += 2
-        
-        if menu_score >= info_score:
-            return "menu items"
-        else:
-            return "general information"
+        return infer_page_type(text)
     
     def chunk_text(self, text: str, chunk_size: int = 500, chunk_overlap: int = 100) -> List[str]:
         """
@@ -190,43 +323,43 @@ class VectorDBBuilder:
         target_chunk_size = 1000  # Up from 600
         overlap_size = 200        # Up from 150
         
-        # Split by sentences first for better chunk boundaries
-        # Handle multiple sentence endings
-        sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])', text)
+        # Split by sentences first for better chunk boundaries. Sentences are
+        # tracked as (start, end) offsets into `text`, so a chunk is only
+        # materialized (one slice) when it is emitted.
+        spans = _split_spans(text, _SENTENCE_BREAK_RE)
         
         # If sentence splitting didn't work well, split by newlines
-        if len(sentences) < 2:
-            sentences = text.split('\n')
+        if len(spans) < 2:
+            spans = _split_spans(text, _NEWLINE_RE)
         
-        current_chunk = ""
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
+        chunk_start = chunk_end = -1
+        for start, end in spans:
+            if chunk_start < 0:
+                chunk_start, chunk_end = start, end
                 continue
             
             # Check if adding this sentence would exceed target size
-            potential_chunk = current_chunk + " " + sentence if current_chunk else sentence
-            
-            if len(potential_chunk) > target_chunk_size and current_chunk:
+            if end - chunk_start > target_chunk_size:
                 # Save current chunk
-                chunks.append(current_chunk.strip())
+                chunks.append(text[chunk_start:chunk_end])
                 
                 # Create overlap: take last N characters from current chunk
-                if len(current_chunk) > overlap_size:
-                    overlap_text = current_chunk[-overlap_size:].strip()
+                if chunk_end - chunk_start > overlap_size:
+                    first = _NON_SPACE_RE.search(text, chunk_end - overlap_size, chunk_end)
+                    overlap_start = first.start() if first else chunk_end
                     # Try to start overlap at a word boundary
-                    first_space = overlap_text.find(' ')
-                    if first_space > 0:
-                        overlap_text = overlap_text[first_space:].strip()
-                    current_chunk = overlap_text + " " + sentence if overlap_text else sentence
+                    first_space = text.find(' ', overlap_start, chunk_end)
+                    if first_space > overlap_start:
+                        first = _NON_SPACE_RE.search(text, first_space, chunk_end)
+                        overlap_start = first.start() if first else chunk_end
+                    chunk_start = overlap_start if overlap_start < chunk_end else start
                 else:
-                    current_chunk = sentence
-            else:
-                current_chunk = potential_chunk
+                    chunk_start = start
+            chunk_end = end
         
         # Add the last chunk
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        if chunk_start >= 0:
+            chunks.append(text[chunk_start:chunk_end])
         
         # Fallback to word-based chunking if sentence splitting failed
         if len(chunks) == 0:
@@ -240,16 +373,20 @@ class VectorDBBuilder:
                     chunks.append(chunk)
         
         # Filter out very small chunks (likely noise)
-        chunks = [chunk for chunk in chunks if len(chunk.strip()) >= 50]
+        chunks = [chunk for chunk in chunks if len(chunk) >= 50]
         
         return chunks
     
     def get_pdf_hash(self, pdf_path: str) -> str:
         """Calculate hash of PDF file to detect changes"""
         try:
+            # Stream in 1 MiB blocks so large PDFs are never fully loaded into
+            # memory; blake2b is faster than MD5 and this is change detection only
+            file_hash = hashlib.blake2b(digest_size=16)
             with open(pdf_path, 'rb') as f:
-                file_hash = hashlib.md5(f.read()).hexdigest()
-            return file_hash
+                while chunk := f.read(_HASH_BLOCK_SIZE):
+                    file_hash.update(chunk)
+            return file_hash.hexdigest()
         except Exception as e:
             print(f"❌ Error calculating hash for {pdf_path}: {e}")
             return ""
@@ -258,8 +395,8 @@ class VectorDBBuilder:
         """Load restaurant index JSON to map PDFs to restaurant IDs"""
         index_path = os.path.join(self.data_dir, "restaurant_index.json")
         try:
-            with open(index_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(index_path, 'rb') as f:
+                return orjson.loads(f.read())
         except Exception as e:
             print(f"❌ Error loading restaurant index: {e}")
             return {"restaurants": []}
@@ -281,7 +418,32 @@ class VectorDBBuilder:
             return {"id": "index", "name": "Restaurant Index", "type": "index"}
         
         return None
-    
+
+    def _neon_writer(self, write_queue: "queue.Queue[Optional[Dict[str, Any]]]"):
+        """
+        Drain embedded files from the build pipeline into NeonDB until a None
+        sentinel arrives. Sets item["neon_synced"] on every item it handles.
+        """
+        import services.neon_vector_store as neon_store
+        while True:
+            item = write_queue.get()
+            if item is None:
+                return
+            try:
+                neon_count = neon_store.upsert_chunks(
+                    restaurant_id=item["restaurant_id"],
+                    restaurant_name=item["restaurant_name"],
+                    chunks=item["contents"],
+                    embeddings=item["embeddings"],
+                    meta_tags=item["meta_tags"],
+                    pdf_filename=item["filename"]
+                )
+                item["neon_synced"] = True
+                print(f"✅ Synced {neon_count} pages from {item['filename']} with meta tags to NeonDB (Cloud)")
+            except Exception as e:
+                item["neon_synced"] = False
+                print(f"⚠️  Failed to sync {item['filename']} to NeonDB: {e}")
+
     def build_vector_db(self, force_rebuild: bool = False):
         """Build vector database from all PDF files"""
         print("\n🚀 Starting Vector Database Build Process...\n")
@@ -301,6 +463,7 @@ class VectorDBBuilder:
         # Track processed files
         processed_count = 0
         total_chunks = 0
+        pending = []  # (file_path, restaurant_id, restaurant_name, file_hash, file_sig) that need (re)ingestion
         
         for file_path in files:
             filename = file_path.name
@@ -324,84 +487,199 @@ class VectorDBBuilder:
             restaurant_id = restaurant_info.get("id", "unknown")
             restaurant_name = restaurant_info.get("name", "Unknown")
             
-            # Check if we need to rebuild (by checking hash)
-            file_hash = self.get_pdf_hash(str(file_path))
+            # Check if we need to rebuild before doing any extraction or
+            # embedding work. A matching (size, mtime) signature skips the file
+            # without reading it; otherwise fall back to the content hash.
+            st = file_path.stat()
+            file_sig = f"{st.st_size}:{st.st_mtime_ns}"
+            file_hash = ""
             
-            # Query existing documents for this restaurant
-            try:
-                existing_docs = self.restaurant_collection.get(
-                    where={"restaurant_id": restaurant_id}
-                )
-                
-                # Check if file has changed
-                needs_update = force_rebuild
-                if existing_docs.get("ids") and len(existing_docs["ids"]) > 0:
-                    # Check if hash matches
-                    existing_hashes = []
-                    if existing_docs.get("metadatas"):
-                        existing_hashes = [doc.get("hash", "") for doc in existing_docs["metadatas"]]
-                    
-                    if file_hash not in existing_hashes:
-                        needs_update = True
-                        print(f"🔄 File has changed, updating vector DB...")
-                        # Delete old documents in ChromaDB
-                        self.restaurant_collection.delete(where={"restaurant_id": restaurant_id})
-                else:
-                    needs_update = True
-            except Exception as e:
-                print(f"⚠️  Error checking existing documents: {e}")
-                needs_update = True
-            
-            # Forcing rebuild for improved extraction
-            if not needs_update and not force_rebuild:
-                print(f"🔄 Forcing rebuild for {restaurant_name} to use improved extraction...")
+            needs_update = force_rebuild
+            if not needs_update:
+                # Query this file's existing documents. Scoped to the file, not
+                # the restaurant: a restaurant can have several source files
+                # (e.g. a PDF and an exported dataset), each with its own sig
                 try:
-                    self.restaurant_collection.delete(where={"restaurant_id": restaurant_id})
-                    needs_update = True
+                    existing_docs = self.restaurant_collection.get(
+                        where={"pdf_filename": filename},
+                        include=["metadatas"]
+                    )
+                    existing_metas = existing_docs.get("metadatas") or []
+                    
+                    if not any(doc.get("sig") == file_sig for doc in existing_metas):
+                        file_hash = self.get_pdf_hash(str(file_path))
+                        existing_hashes = {doc.get("hash", "") for doc in existing_metas}
+                        
+                        # Check if file has changed
+                        if file_hash not in existing_hashes:
+                            needs_update = True
+                            if existing_hashes:
+                                print(f"🔄 File has changed, updating vector DB...")
+                        else:
+                            # Same content, new mtime (e.g. re-copied): refresh the
+                            # signature so the next run skips the hash as well
+                            self.restaurant_collection.update(
+                                ids=existing_docs["ids"],
+                                metadatas=[{**doc, "sig": file_sig} for doc in existing_metas]
+                            )
                 except Exception as e:
-                    print(f"⚠️  Error deleting old docs: {e}")
+                    print(f"⚠️  Error checking existing documents: {e}")
                     needs_update = True
             
+            if needs_update and not file_hash:
+                file_hash = self.get_pdf_hash(str(file_path))
+            
             if not needs_update:
                 print(f"✅ {restaurant_name} already up to date, skipping...\n")
                 continue
             
-            # Extract pages/content
-            if filename.lower().endswith(".pdf"):
-                extracted_pages = self.extract_text_from_pdf(str(file_path))
-            else:
-                extracted_pages = self.extract_text_from_txt(str(file_path))
-            
+            pending.append((file_path, restaurant_id, restaurant_name, file_hash, file_sig))
+        
+        # Pipeline extraction, embedding and NeonDB writes: PDFs extract in a
+        # process pool while the main thread embeds whatever has already
+        # arrived and a writer thread pushes embedded files to NeonDB, so wall
+        # time is roughly max(extract, encode, write) instead of their sum.
+        write_queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=_PIPELINE_QUEUE_SIZE)
+        writer = threading.Thread(target=self._neon_writer, args=(write_queue,), daemon=True)
+        writer.start()
+        
+        ingested: List[Dict[str, Any]] = []  # embedded files, in completion order
+        buffer: List[Dict[str, Any]] = []    # extracted files waiting to be embedded
+        buffered_rows = 0
+        
+        def flush_buffer():
+            """Embed every buffered file in one batched encode call and hand them to the writer"""
+            nonlocal buffered_rows
+            if not buffer:
+                return
+            contents = [c for item in buffer for c in item["contents"]]
+            print(f"🧮 Generating embeddings for {len(contents)} pages across {len(buffer)} file(s)...")
+            # sentence-transformers sorts inputs by length internally, so a
+            # few large calls pad far less than many small per-file calls
+            embeddings = self.embed(contents)
+            offset = 0
+            for item in buffer:
+                end = offset + len(item["contents"])
+                item["embeddings"] = embeddings[offset:end]
+                offset = end
+                ingested.append(item)
+                write_queue.put(item)
+            buffer.clear()
+            buffered_rows = 0
+        
+        def accept(job, extracted_pages):
+            """Buffer one extracted file, embedding once enough rows have built up"""
+            nonlocal buffered_rows
+            file_path, restaurant_id, restaurant_name, file_hash, file_sig = job
             if not extracted_pages:
-                print(f"⚠️  No content extracted from {filename}, skipping...\n")
-                continue
-            
-            # Prepare data for storage
-            contents = [p['content'] for p in extracted_pages]
-            meta_tags = [p['type'] for p in extracted_pages]
+                print(f"⚠️  No content extracted from {file_path.name}, skipping...\n")
+                return
+            buffer.append({
+                "filename": file_path.name,
+                "restaurant_id": restaurant_id,
+                "restaurant_name": restaurant_name,
+                "hash": file_hash,
+                "sig": file_sig,
+                "contents": [p['content'] for p in extracted_pages],
+                "meta_tags": [p['type'] for p in extracted_pages]
+            })
+            buffered_rows += len(extracted_pages)
+            if buffered_rows >= self.encode_batch_size * _ENCODE_FLUSH_BATCHES:
+                flush_buffer()
+        
+        try:
+            # Plain text files are cheap to read inline
+            pdf_jobs = []
+            for job in pending:
+                if job[0].name.lower().endswith(".pdf"):
+                    pdf_jobs.append(job)
+                else:
+                    accept(job, self.extract_text_from_txt(str(job[0])))
             
-            # Create embeddings (Optional: making it optional as per request "instead of embeddings")
-            # We'll keep them for now but allow the system to function without them if needed
-            print(f"🧮 Generating embeddings for {len(contents)} pages...")
-            embeddings = self.embedding_model.encode(contents, show_progress_bar=True)
+            # PDFs are CPU-bound in pdfplumber; as_completed lets the main
+            # thread embed finished files while the rest are still extracting
+            if pdf_jobs:
+                with ProcessPoolExecutor(max_workers=min(len(pdf_jobs), os.cpu_count() or 1)) as executor:
+                    futures = {executor.submit(extract_text_from_pdf, str(job[0])): job for job in pdf_jobs}
+                    for future in as_completed(futures):
+                        job = futures[future]
+                        try:
+                            extracted_pages = future.result()
+                        except Exception as e:
+                            print(f"❌ Error extracting text from {job[0]}: {e}")
+                            extracted_pages = []
+                        accept(job, extracted_pages)
+            flush_buffer()
+        finally:
+            write_queue.put(None)
+            writer.join()
+        
+        # Only files that reached NeonDB get their hash recorded in ChromaDB;
+        # the rest keep their old hash so the next run retries them
+        for item in ingested:
+            if not item.get("neon_synced"):
+                print(f"⚠️  {item['filename']} not recorded as up to date, it will be retried on the next run")
+        ingested = [item for item in ingested if item.get("neon_synced")]
+        
+        # ChromaDB rows for every ingested file, flushed in bulk below. Stored
+        # as parallel arrays preallocated to the final row count.
+        row_count = sum(len(item["contents"]) for item in ingested)
+        chroma_filenames: List[str] = []
+        chroma_ids: List[Optional[str]] = [None] * row_count
+        chroma_docs: List[Optional[str]] = [None] * row_count
+        chroma_metas: List[Optional[Dict[str, Any]]] = [None] * row_count
+        all_embeddings = np.concatenate([item["embeddings"] for item in ingested]) if ingested else None
+        
+        offset = 0
+        for item in ingested:
+            restaurant_id = item["restaurant_id"]
+            contents = item["contents"]
+            end = offset + len(contents)
             
-            # ── Store in NeonDB (pgvector) ──────────────────────────────────────
-            import services.neon_vector_store as neon_store
+            # Only the tag varies per row
+            base_meta = {
+                "restaurant_id": restaurant_id,
+                "restaurant_name": item["restaurant_name"],
+                "pdf_filename": item["filename"],
+                "hash": item["hash"],
+                "sig": item["sig"]
+            }
+            chroma_filenames.append(item["filename"])
+            # Unique per file: several files can map to the same restaurant
+            chroma_ids[offset:end] = [f"{restaurant_id}_{item['filename']}_{i}" for i in range(len(contents))]
+            chroma_docs[offset:end] = contents
+            chroma_metas[offset:end] = [{**base_meta, "tag": tag} for tag in item["meta_tags"]]
+            offset = end
+
+            total_chunks += len(contents)
+            processed_count += 1
+        
+        # Mirror into ChromaDB with the file hash so the next run can skip
+        # unchanged files. All files go in a few large upserts instead of one
+        # round-trip (and HNSW update) per file; the files' previous rows are
+        # only deleted once every upsert has succeeded.
+        if chroma_ids:
             try:
-                neon_count = neon_store.upsert_chunks(
-                    restaurant_id=restaurant_id,
-                    restaurant_name=restaurant_name,
-                    chunks=contents,
-                    embeddings=embeddings,
-                    meta_tags=meta_tags,
-                    pdf_filename=filename
+                previous = self.restaurant_collection.get(
+                    where={"pdf_filename": {"$in": chroma_filenames}}, include=[]
                 )
-                print(f"✅ Synced {neon_count} pages with meta tags to NeonDB (Cloud)")
+                for i in range(0, len(chroma_ids), _CHROMA_WRITE_BATCH):
+                    end = i + _CHROMA_WRITE_BATCH
+                    self.restaurant_collection.upsert(
+                        ids=chroma_ids[i:end],
+                        documents=chroma_docs[i:end],
+                        # Rows line up with all_embeddings; convert each slice to
+                        # lists in one C-level call (chromadb 0.4 rejects ndarrays)
+                        embeddings=all_embeddings[i:end].tolist(),
+                        metadatas=chroma_metas[i:end]
+                    )
+                new_ids = set(chroma_ids)
+                stale_ids = [doc_id for doc_id in previous["ids"] if doc_id not in new_ids]
+                if stale_ids:
+                    self.restaurant_collection.delete(ids=stale_ids)
+                print(f"✅ Stored {len(chroma_ids)} chunks in ChromaDB")
             except Exception as e:
-                print(f"⚠️  Failed to sync to NeonDB: {e}")
-
-            total_chunks += len(extracted_pages)
-            processed_count += 1
+                print(f"⚠️  ChromaDB sync failed (non-critical): {e}")
         
         # Store restaurant index metadata
         self._store_restaurant_index_metadata(restaurant_index)
@@ -433,7 +711,7 @@ class VectorDBBuilder:
         
         # 3. Create embeddings
         print(f"🧮 Generating embeddings for {len(contents)} pages...")
-        embeddings = self.embedding_model.encode(contents, show_progress_bar=True)
+        embeddings = self.embed(contents, show_progress_bar=True)
         
         # 4. Store in NeonDB
         import services.neon_vector_store as neon_store
@@ -547,7 +825,7 @@ class VectorDBBuilder:
 
         # Generate embeddings
         print(f"🧮 [JSON Ingest] Generating embeddings for {len(contents)} structured chunks...")
-        embeddings = self.embedding_model.encode(contents, show_progress_bar=False)
+        embeddings = self.embed(contents)
 
         # Store in NeonDB
         import services.neon_vector_store as neon_store
@@ -570,11 +848,12 @@ class VectorDBBuilder:
         try:
             self.restaurant_collection.delete(where={"restaurant_id": restaurant_id})
             ids = [f"{restaurant_id}_chunk_{i}" for i in range(len(contents))]
+            base_meta = {"restaurant_id": restaurant_id, "restaurant_name": restaurant_name}
             self.restaurant_collection.upsert(
                 ids=ids,
                 documents=contents,
-                embeddings=[e.tolist() for e in embeddings],
-                metadatas=[{"restaurant_id": restaurant_id, "restaurant_name": restaurant_name, "tag": meta_tags[i]} for i in range(len(contents))]
+                embeddings=embeddings.tolist(),
+                metadatas=[{**base_meta, "tag": tag} for tag in meta_tags]
             )
             print(f"✅ [JSON Ingest] Also stored {len(contents)} chunks in ChromaDB")
         except Exception as e:
@@ -592,24 +871,54 @@ class VectorDBBuilder:
     def _store_restaurant_index_metadata(self, restaurant_index: Dict):
         """Store restaurant index metadata in vector DB"""
         try:
-            # Convert restaurant index to text for embedding
-            index_text = json.dumps(restaurant_index, indent=2)
+            # One plain line per restaurant; raw JSON spends most of its
+            # tokens on braces, quotes and indentation
+            lines = []
+            for r in restaurant_index.get("restaurants", []):
+                descriptors = [r.get("cuisine", "")] + r.get("keywords", [])
+                lines.append(f"{r.get('name', '')} ({r.get('id', '')}): {', '.join(d for d in descriptors if d)}")
+            index_text = "\n".join(lines)
             
             # Create embedding
-            embedding = self.embedding_model.encode([index_text])[0]
+            embeddings = self.embed([index_text])
             
             # Store in index collection
             self.index_collection.upsert(
                 ids=["restaurant_index"],
                 documents=[index_text],
-                embeddings=[embedding.tolist()],
-                metadatas=[{"type": "restaurant_index", "version": "1.0"}]
+                embeddings=embeddings.tolist(),
+                metadatas=[{"type": "restaurant_index", "version": "1.1"}]
             )
             
             print("✅ Stored restaurant index metadata")
         except Exception as e:
             print(f"⚠️  Error storing restaurant index metadata: {e}")
     
+    def _data_dir_snapshot(self) -> Dict[str, tuple]:
+        """(size, mtime) of every ingestible file in the data directory"""
+        snapshot = {}
+        for pattern in ("*.pdf", "*.txt", "restaurant_index.json"):
+            for path in Path(self.data_dir).glob(pattern):
+                st = path.stat()
+                snapshot[path.name] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+    
+    def watch(self, interval: float = 5.0):
+        """Keep the embedding model resident and rebuild whenever the data directory changes"""
+        # Reloading the model costs seconds per invocation; a resident process
+        # pays it once and each rebuild only re-ingests the files that changed
+        print(f"👀 Watching {self.data_dir} for changes every {interval:g}s (Ctrl+C to stop)...")
+        snapshot = self._data_dir_snapshot()
+        try:
+            while True:
+                time.sleep(interval)
+                current = self._data_dir_snapshot()
+                if current != snapshot:
+                    snapshot = current
+                    self.build_vector_db()
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching")
+    
     def get_collection_stats(self) -> Dict:
         """Get statistics about the vector database"""
         try:
@@ -646,6 +955,17 @@ def main():
         default="vector_db",
         help="Directory for vector database storage (default: vector_db)"
     )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild whenever files in the data directory change"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5.0,
+        help="Seconds between data directory checks in --watch mode (default: 5)"
+    )
     
     args = parser.parse_args()
     
@@ -663,6 +983,9 @@ def main():
     print("\n📊 Vector Database Statistics:")
     for key, value in stats.items():
         print(f"   - {key}: {value}")
+    
+    if args.watch:
+        builder.watch(interval=args.interval)
 
 
 if __name__ == "__main__":
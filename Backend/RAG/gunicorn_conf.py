@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for the RAG service.
+
+Usage:
+    gunicorn -c gunicorn_conf.py main:app
+
+Sessions and carts live in each worker's memory, so /chat requests from one
+session must keep hitting the same worker. Raise WEB_CONCURRENCY above 1
+only behind sticky routing, or for WebSocket-only traffic, where a
+connection stays on one worker for its lifetime.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+keepalive = 5
+# Model loading at startup takes a while on cold caches
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# Each worker builds its own models and DB clients in the FastAPI lifespan;
+# the Chroma client is not fork-safe, so the app is not preloaded
+preload_app = False
@@ -3,15 +3,17 @@ import os
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-import json
 import asyncio
+import logging
 import tempfile
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import uvicorn
 from dotenv import load_dotenv
+import orjson
 
 from utils.rag_system import MultiRestaurantRAGSystem
 from services.llm_service import OpenAILLMService
@@ -20,8 +22,12 @@ from services.orchestrator_service import OrchestratorService
 from services.session_service import SessionManager
 from build_vector_db import VectorDBBuilder
 from services import neon_vector_store
+from utils.logging_config import setup_logging
 
 load_dotenv()
+setup_logging()
+
+logger = logging.getLogger("rag.api")
 
 from contextlib import asynccontextmanager
 
@@ -37,31 +43,32 @@ orchestrator = None
 async def lifespan(app: FastAPI):
     global rag_system, llm_service, db_builder, session_manager, orchestrator
     
-    print("🚀 Starting Multi-Restaurant RAG Voice Assistant...")
+    logger.info("🚀 Starting Multi-Restaurant RAG Voice Assistant...")
     
     try:
         # 1. Base Services
         rag_system = MultiRestaurantRAGSystem()
         llm_service = OpenAILLMService()
-        db_builder = VectorDBBuilder()
+        # VectorDBBuilder is created on the first ingest request (get_db_builder)
         neon_vector_store.setup_table()
         
         # 2. Advanced Orchestration
         session_manager = SessionManager()
         orchestrator = OrchestratorService(llm_service, rag_system, session_manager)
         
-        print("✅ System Core, RAG & Orchestrator ready.")
+        logger.info("✅ System Core, RAG & Orchestrator ready.")
     except Exception as e:
-        print(f"❌ Error during startup: {e}")
+        logger.error("❌ Error during startup: %s", e)
         
     yield
-    print("👋 Shutting down Multi-Restaurant RAG Voice Assistant...")
+    logger.info("👋 Shutting down Multi-Restaurant RAG Voice Assistant...")
 
 # Initialize FastAPI app with lifespan
 app = FastAPI(
     title="Multi-Restaurant RAG Voice Assistant", 
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -76,18 +83,43 @@ app.add_middleware(
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # Set for O(1) disconnects; all access happens on the event loop thread
+        self.active_connections: Set[WebSocket] = set()
+        # One writer per socket: streamed deltas and replies can
+        # otherwise interleave frames on the same connection
+        self.send_locks: Dict[WebSocket, asyncio.Lock] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
+        self.send_locks[websocket] = asyncio.Lock()
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
+        self.send_locks.pop(websocket, None)
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        lock = self.send_locks.get(websocket)
+        if lock is None:
+            await websocket.send_text(message)
+            return
+        async with lock:
+            await websocket.send_text(message)
 
 manager = ConnectionManager()
 
+_db_builder_lock = asyncio.Lock()
+
+async def get_db_builder() -> VectorDBBuilder:
+    """Create the vector DB builder on first use, sharing the RAG system's embedding model"""
+    global db_builder
+    if db_builder is None:
+        async with _db_builder_lock:
+            if db_builder is None:
+                embedding_model = rag_system.embedding_model if rag_system else None
+                db_builder = await asyncio.to_thread(VectorDBBuilder, embedding_model=embedding_model)
+    return db_builder
+
 # Pydantic models
 class ChatRequest(BaseModel):
     message: str
@@ -113,31 +145,44 @@ async def health_check():
         "orchestrator": "ready" if orchestrator else "pending"
     }
 
+@app.get("/cache/stats")
+async def cache_stats():
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="System initializing")
+    return {
+        "exact": orchestrator.response_cache.stats(),
+        "semantic": orchestrator.semantic_cache.stats(),
+        "classifier": orchestrator.classification_cache.stats(),
+        "retrieval": rag_system.retrieval_cache.stats() if rag_system else None,
+        "retrieval_semantic": rag_system.semantic_retrieval_cache.stats() if rag_system else None,
+        "embeddings": rag_system.embedding_cache.stats() if rag_system else None
+    }
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     if not orchestrator:
         raise HTTPException(status_code=503, detail="System initializing")
     
     try:
-        print(f"💬 Chat: {request.message} (user_id: {request.user_id})")
+        logger.info("💬 Chat: %s (user_id: %s)", request.message, request.user_id)
         
         # Delegate to Orchestrator (which handles Agents)
         result = await orchestrator.handle_query(request.message, request.session_id, request.user_id)
         
-        return ChatResponse(
-            response=result.get("response", ""),
-            response_en=result.get("response_en", ""),
-            response_ur=result.get("response_ur", ""),
-            restaurant_name=result.get("restaurant_name", "Assistant"),
-            confidence=result.get("confidence", 1.0),
-            suggestions=result.get("suggestions", []),
-            response_type=result.get("response_type", "chat"),
-            cart=result.get("cart", [])
-        )
+        # Returning the response directly skips FastAPI's response_model
+        # validation pass; ChatResponse stays on the route for the schema
+        return ORJSONResponse({
+            "response": result.get("response", ""),
+            "response_en": result.get("response_en", ""),
+            "response_ur": result.get("response_ur", ""),
+            "restaurant_name": result.get("restaurant_name", "Assistant"),
+            "confidence": result.get("confidence", 1.0),
+            "suggestions": result.get("suggestions", []),
+            "response_type": result.get("response_type", "chat"),
+            "cart": result.get("cart", [])
+        })
     except Exception as e:
-        print(f"❌ Chat Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Chat Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ingest-restaurant")
@@ -150,7 +195,10 @@ async def ingest_restaurant(
     Ingest a restaurant's PDF/TXT information into the RAG system.
     Extracts text, creates embeddings, and stores in NeonDB and ChromaDB.
     """
-    if not db_builder:
+    try:
+        builder = await get_db_builder()
+    except Exception as e:
+        logger.error("❌ DB Builder init failed: %s", e)
         raise HTTPException(status_code=503, detail="DB Builder not initialized")
     
     # Check file extension
@@ -165,9 +213,9 @@ async def ingest_restaurant(
             tmp_path = tmp.name
         
         # Process the file
-        print(f"📥 Processing ingest request for {restaurant_name} ({restaurant_id})")
+        logger.info("📥 Processing ingest request for %s (%s)", restaurant_name, restaurant_id)
         result = await asyncio.to_thread(
-            db_builder.ingest_single_file, 
+            builder.ingest_single_file, 
             tmp_path, 
             restaurant_id, 
             restaurant_name
@@ -178,6 +226,13 @@ async def ingest_restaurant(
             os.remove(tmp_path)
             
         if result.get("success"):
+            # Refresh the restaurant index (and drop cached retrieval results)
+            # and drop cached answers so the new menu is used immediately
+            if rag_system:
+                await asyncio.to_thread(rag_system.load_restaurant_index)
+            if orchestrator:
+                orchestrator.clear_response_caches()
+
             return {
                 "success": True,
                 "message": f"Successfully ingested {restaurant_name}",
@@ -188,9 +243,7 @@ async def ingest_restaurant(
             raise HTTPException(status_code=500, detail=result.get("error", "Unknown ingestion error"))
             
     except Exception as e:
-        print(f"❌ Ingestion Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Ingestion Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ingest-restaurant-json")
@@ -200,7 +253,10 @@ async def ingest_restaurant_json(payload: dict):
     Produces perfectly tagged [SECTION: MENU ITEMS], [SECTION: RESTAURANT IDENTITY]
     chunks that the bot can use precisely and consistently.
     """
-    if not db_builder:
+    try:
+        builder = await get_db_builder()
+    except Exception as e:
+        logger.error("❌ DB Builder init failed: %s", e)
         raise HTTPException(status_code=503, detail="DB Builder not initialized")
 
     restaurant_id = payload.get("restaurant_id")
@@ -211,18 +267,21 @@ async def ingest_restaurant_json(payload: dict):
         raise HTTPException(status_code=400, detail="restaurant_id and restaurant_name are required")
 
     try:
-        print(f"📥 JSON ingest request for {restaurant_name} ({restaurant_id})")
+        logger.info("📥 JSON ingest request for %s (%s)", restaurant_name, restaurant_id)
         result = await asyncio.to_thread(
-            db_builder.ingest_from_json,
+            builder.ingest_from_json,
             data,
             restaurant_id,
             restaurant_name
         )
 
         if result.get("success"):
-            # Refresh the RAG system's restaurant index so new aliases work immediately
+            # Refresh the RAG system's restaurant index so new aliases work
+            # immediately, and drop cached answers built from the old menu
             if rag_system:
                 await asyncio.to_thread(rag_system.load_restaurant_index)
+            if orchestrator:
+                orchestrator.clear_response_caches()
 
             return {
                 "success": True,
@@ -237,31 +296,42 @@ async def ingest_restaurant_json(payload: dict):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ JSON Ingestion Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ JSON Ingestion Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.websocket("/ws/voice")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
-    print("🔌 WS Connected")
+    logger.info("🔌 WS Connected")
     
     try:
         while True:
             data = await websocket.receive_text()
-            msg = json.loads(data)
+            msg = orjson.loads(data)
             
             if msg.get("type") == "chat":
                 text = msg.get("message", "")
                 session_id = msg.get("session_id", "default_session")
                 user_id = msg.get("user_id")
                 
+                # Stream English text to the client as the LLM produces it so
+                # TTS can start early; the full response frame follows
+                streamed = []
+                async def send_delta(delta: str):
+                    streamed.append(delta)
+                    await manager.send_personal_message(orjson.dumps({"type": "chat_delta", "text": delta}).decode(), websocket)
+                
                 # Use Orchestrator
-                result = await orchestrator.handle_query(text, session_id, user_id)
+                result = await orchestrator.handle_query(text, session_id, user_id, on_delta=send_delta)
                 
-                await websocket.send_text(json.dumps({
+                # The reply can differ from what was streamed, e.g. a canned
+                # fallback after the stream failed midway; tell the client to
+                # discard the partial text before the full response arrives
+                if streamed and "".join(streamed) != result.get("response_en", ""):
+                    await manager.send_personal_message(orjson.dumps({"type": "chat_reset"}).decode(), websocket)
+                
+                await manager.send_personal_message(orjson.dumps({
                     "type": "chat_response",
                     "response": result.get("response", ""),
                     "response_en": result.get("response_en", ""),
@@ -271,14 +341,16 @@ async def websocket_endpoint(websocket: WebSocket):
                     "suggestions": result.get("suggestions", []),
                     "response_type": result.get("response_type", "chat"),
                     "cart": result.get("cart", [])
-                }))
+                }).decode(), websocket)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
-        print("🔌 WS Disconnected")
+        logger.info("🔌 WS Disconnected")
     except Exception as e:
-        print(f"❌ WS Error: {e}")
-        await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+        logger.error("❌ WS Error: %s", e)
+        await manager.send_personal_message(orjson.dumps({"type": "error", "message": str(e)}).decode(), websocket)
+        manager.disconnect(websocket)
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    # "auto" picks uvloop + httptools when installed (uvloop is not on Windows)
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True, loop="auto", http="auto")
@@ -1,10 +1,31 @@
+import re
 from typing import Dict, Any
 
+# Messages that are nothing but a greeting, farewell or thanks. Matched once
+# against the whole message (one C-level regex pass) so the orchestrator can
+# route them here without an LLM classification call.
+_SMALL_TALK_RE = re.compile(
+    r'^\W*(?:'
+    r'(?P<greet>hi|hello|hey|hiya|greetings|good (?:morning|afternoon|evening)|'
+    r'salam|salaam|as+alam+ ?o? ?alaikum|aoa)|'
+    r'(?P<bye>bye|goodbye|good night|see you|allah hafiz|khuda hafiz)|'
+    r'(?P<thanks>thanks|thank you|thx|shukriya|shukria)'
+    r')(?:\s+(?:there|everyone|all|so much|a lot|bhai|jee|ji))?\W*$',
+    re.IGNORECASE
+)
+
+
+def small_talk_kind(query: str):
+    """Return 'greet', 'bye' or 'thanks' if the query is pure small talk, else None"""
+    match = _SMALL_TALK_RE.match(query)
+    return match.lastgroup if match else None
+
+
 class BasicHandler:
     def __init__(self, llm_service):
         self.llm_service = llm_service
 
-    async def handle(self, query: str, history: list = None, summary: str = "") -> Dict[str, Any]:
+    async def handle(self, query: str, history: list = None, summary: str = "", on_delta=None) -> Dict[str, Any]:
         """Handle basic greetings and simple interactions using LLM with context"""
         # Specific prompt for basic/general interactions
         history_context = f"\nPAST CONVERSATION SUMMARY: {summary}\n" if summary else ""
@@ -24,7 +45,8 @@ class BasicHandler:
         responses = await self.llm_service.generate_dual_response(
             user_message=query,
             context=basic_prompt_suffix,
-            conversation_history=history
+            conversation_history=history,
+            on_delta=on_delta
         )
         
         return {
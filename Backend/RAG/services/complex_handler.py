@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import asyncio
 
 class ComplexHandler:
@@ -6,11 +6,13 @@ class ComplexHandler:
         self.llm_service = llm_service
         self.rag_system = rag_system
 
-    async def handle(self, query: str, history: list = None, summary: str = "") -> Dict[str, Any]:
+    async def handle(self, query: str, history: list = None, summary: str = "", rag_result: Optional[Dict[str, Any]] = None,
+                     on_delta=None) -> Dict[str, Any]:
         """Handle complex menu/restaurant queries using RAG with history context"""
         
-        # 1. RAG Context Retrieval
-        rag_result = await asyncio.to_thread(self.rag_system.process_query, query, summary)
+        # 1. RAG Context Retrieval (the orchestrator may have prefetched it)
+        if rag_result is None:
+            rag_result = await asyncio.to_thread(self.rag_system.process_query, query, summary)
         raw_context = rag_result.get('context', '')
         
         # 2. Build combined context including history summary
@@ -24,7 +26,8 @@ class ComplexHandler:
         responses = await self.llm_service.generate_dual_response(
             user_message=query, 
             context=combined_context,
-            conversation_history=history
+            conversation_history=history,
+            on_delta=on_delta
         )
         
         # Metadata extraction
@@ -0,0 +1,75 @@
+"""
+Persistent on-disk cache of chunk embeddings.
+
+Menu PDFs repeat the same headers, footers and address blocks, and
+incremental rebuilds re-ingest mostly unchanged text, so most chunks have
+already been embedded once. Vectors are keyed by a blake2b digest of a
+namespace (the model and the backend it runs on, see embedding_namespace)
+and the chunk text, and stored int8-quantized in a local SQLite file
+(388 bytes per 384-dim vector instead of 1536 as float32).
+
+Schema:
+  embeddings_q8(
+      key    BLOB PRIMARY KEY,   -- blake2b(namespace + chunk text), 16 bytes
+      vector BLOB NOT NULL,      -- int8 components
+      scale  REAL NOT NULL       -- per-vector scale: value = component * scale
+  )
+"""
+
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, namespace: str):
+        self.namespace = namespace.encode("utf-8") + b"\x00"
+        # Ingest endpoints run in FastAPI's threadpool, so share one
+        # connection behind a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings_q8 "
+                "(key BLOB PRIMARY KEY, vector BLOB NOT NULL, scale REAL NOT NULL)"
+            )
+
+    def key(self, text: str) -> bytes:
+        """Cache key for a chunk of text"""
+        return hashlib.blake2b(self.namespace + text.encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the cached vectors for whichever keys are present"""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self.lock:
+            for i in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector, scale FROM embeddings_q8 WHERE key IN ({placeholders})", batch
+                )
+                for key, vector, scale in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.int8).astype(np.float32) * scale
+        return found
+
+    def put_many(self, vectors: Dict[bytes, np.ndarray]):
+        """Store newly computed vectors"""
+        rows = []
+        for key, vec in vectors.items():
+            # Symmetric per-vector quantization; unit-normalized embeddings
+            # lose well under 1% cosine similarity
+            vec = np.asarray(vec, dtype=np.float32)
+            scale = float(np.abs(vec).max()) / 127 or 1.0
+            quantized = np.round(vec / scale).astype(np.int8)
+            rows.append((key, quantized.tobytes(), scale))
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings_q8 (key, vector, scale) VALUES (?, ?, ?)", rows
+            )
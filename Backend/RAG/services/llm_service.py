@@ -1,7 +1,12 @@
 import os
-import json
+import random
+import asyncio
+import logging
+import orjson
 import requests
-from typing import Dict, Any, Optional, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable, Awaitable, Set
 from dotenv import load_dotenv
 import re
 
@@ -9,6 +14,281 @@ load_dotenv()
 
 import httpx
 
+logger = logging.getLogger("rag.llm")
+
+# Markdown left in replies would be read aloud by TTS
+_MARKDOWN_BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+_MARKDOWN_ITALIC_RE = re.compile(r'\*([^*]+)\*')
+_MARKDOWN_HEADING_RE = re.compile(r'#+\s*')
+_WHITESPACE_RE = re.compile(r'\s+')
+_NON_DIGIT_RE = re.compile(r'\D')
+
+# Rate limits and transient upstream failures worth another attempt
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Prompts are module constants and never interpolated: providers cache
+# identical prompt prefixes, so static text must come first and stay
+# byte-for-byte stable across requests.
+_SYSTEM_PROMPT = """You are a friendly AI voice-ordering assistant for a multi-restaurant food platform.
+Your responses are warm, natural, and conversational (1-3 sentences max). You speak like a knowledgeable friend helping someone decide what to eat.
+
+CONVERSATIONAL STYLE:
+- Speak naturally, like a phone assistant. No markdown, no bullet points.
+- Use the customer's name occasionally if they shared it.
+- When listing items, read them naturally: "From Ranchers, you have Malai Tikka for PKR 500 and Smoky BBQ Ranch Burger."
+- If the user mixes languages (Roman Urdu/English), respond in the same tone.
+- Be helpful and proactive — if items are limited, suggest what IS available and ask what they'd like.
+
+=== STRICT MENU RULES (NEVER BREAK THESE) ===
+
+1. ORDERABLE ITEMS: ONLY items in [SECTION: MENU ITEMS] with a PKR price AND an Item ID can be offered for ordering.
+2. IDENTITY ITEMS: Items in [SECTION: RESTAURANT IDENTITY] under "Specialties" (e.g., Chicken Kiev, Loaded Burgers) are DESCRIPTIONS of the restaurant style — NOT orderable unless also in [SECTION: MENU ITEMS].
+3. If asked about an item that exists in IDENTITY but NOT in MENU ITEMS:
+   → Say naturally: "That's not on the current menu, but from [Restaurant] you can order [list MENU ITEMS]."
+   → Do NOT say "That's listed as a specialty" — that sounds robotic.
+4. If an item has PKR 0 or no price, say "the price isn't listed" — don't quote 0.
+5. NEVER invent or guess prices. Only quote what's in the context.
+6. If the menu context has no items at all, say: "I don't have the full menu right now, but I can check — what are you looking for?"
+
+=== MULTI-RESTAURANT RULES ===
+7. Only mention restaurants that appear in the provided context.
+8. When a user switches restaurants, acknowledge smoothly: "Sure, let me check Cheezious for you!"
+9. Track which restaurant the user is focused on from recent conversation — don't jump restaurant contexts randomly.
+10. If confused about which restaurant the user means, ask once: "Did you mean Ranchers or Cheezious?"
+11. 'koi aur', 'aur koi', 'Iske alava' = user wants to know about OTHER restaurants — list all available.
+
+=== SUMMARY & CONTEXT RULES ===
+12. The conversation SUMMARY tells you what was discussed before. Trust it but verify against the current MENU CONTEXT.
+13. If the summary mentions an item but it's not in the current MENU CONTEXT, do not confirm it — say it's not currently available.
+14. If the user says "wahi wala", "pehle wala", "us wali cheez" — refer to the most recent item discussed in history.
+"""
+
+_DUAL_RESPONSE_RULES = """
+        CRITICAL: You MUST respond in JSON format with exactly two keys:
+        1. "en": Your natural English response.
+        2. "ur": Your natural Urdu response written in PROPER URDU SCRIPT (Arabic/Nastaliq characters - e.g. آپ کا کھانا تیار ہے).
+
+        URDU LANGUAGE RULES:
+        - Write "ur" ONLY in real Urdu script (Unicode Arabic characters like ا ب پ ت ث ج etc.).
+        - DO NOT use Roman Urdu (do not write 'aapka khana' - write 'آپ کا کھانا' instead).
+        - English loanwords that Pakistanis naturally use in Urdu conversation should stay in English. For example: restaurant names, food item names ("Biryani", "Karahi"), prices ("PKR 500"), and brand names ("Cheezious") should stay as they are.
+        - Speak naturally like a friendly Pakistani assistant, NOT like a formal translated document.
+        - CORRECT example: {"en": "Hello, how can I help you?", "ur": "ہیلو! میں آپ کی کیا مدد کر سکتا ہوں؟"}
+        - WRONG example: {"ur": "Hello, main aapki kya madad kar sakta hoon?"} ← This is Roman Urdu, NOT allowed.
+        """
+
+_DUAL_SYSTEM_PROMPT = _SYSTEM_PROMPT + _DUAL_RESPONSE_RULES
+
+_SUMMARY_PROMPT = """You are a factual summarization assistant. Track restaurant context carefully.
+
+Update the conversation summary in 1-2 sentences. Include:
+- Customer's name (if shared)
+- Which restaurant(s) the customer is currently interested in
+- Which items have been discussed or ordered
+- Whether the customer has switched restaurants
+Return ONLY the updated summary, no labels."""
+
+_URDU_TRANSLATION_PROMPT = "Translate the text into natural Urdu script (Arabic characters). No English alphabet."
+
+_URDU_BATCH_TRANSLATION_PROMPT = (
+    "Translate each numbered English text into natural Urdu script (Arabic characters). No English alphabet. "
+    'Return JSON {"translations": [...]} with one string per input, in the same order.'
+)
+
+
+class TranslationBatcher:
+    """
+    Micro-batches concurrent Urdu translation requests: waits up to
+    max_delay_ms for up to max_batch texts and translates them in one call.
+    """
+
+    def __init__(self, llm_service, max_batch: int = 8, max_delay_ms: int = 15):
+        self.llm_service = llm_service
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        # The loop only holds weak references to tasks; keep in-flight
+        # batches alive until they finish
+        self.dispatches: Set[asyncio.Task] = set()
+
+    async def translate(self, text: str) -> str:
+        """Queue one text and wait for its translation"""
+        # Started lazily so the queue and consumer bind to the running loop
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Don't hold up the next batch while this one is in flight
+            task = asyncio.create_task(self._dispatch(batch))
+            self.dispatches.add(task)
+            task.add_done_callback(self.dispatches.discard)
+
+    async def _dispatch(self, batch: list):
+        texts = [text for text, _ in batch]
+        try:
+            results = await self._translate_batch(texts)
+        except Exception as e:
+            logger.warning("⚠️ Batch translation failed: %s", e)
+            results = texts
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _translate_batch(self, texts: List[str]) -> List[str]:
+        if len(texts) == 1:
+            return [await self._translate_one(texts[0])]
+
+        numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, 1))
+        messages = [
+            {"role": "system", "content": _URDU_BATCH_TRANSLATION_PROMPT},
+            {"role": "user", "content": numbered}
+        ]
+        raw = await self.llm_service._call_openai_async(
+            messages, max_tokens=300 * len(texts), response_format={"type": "json_object"}
+        )
+        translations = None
+        if raw:
+            try:
+                payload = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                payload = None
+            if isinstance(payload, dict):
+                translations = payload.get("translations")
+        if isinstance(translations, list) and len(translations) == len(texts):
+            return [str(t).strip() or text for t, text in zip(translations, texts)]
+
+        # Malformed or misaligned output: translate individually rather than
+        # return English to everyone or risk mixing up users
+        logger.warning("⚠️ Batch translation returned no usable list, translating individually")
+        return list(await asyncio.gather(*(self._translate_one(text) for text in texts)))
+
+    async def _translate_one(self, text: str) -> str:
+        messages = [
+            {"role": "system", "content": _URDU_TRANSLATION_PROMPT},
+            {"role": "user", "content": f"Translate this to Urdu script: {text}"}
+        ]
+        response = await self.llm_service._call_openai_async(messages, max_tokens=300)
+        return response or text
+
+
+# Markdown markers and whitespace at the end of streamed text can still pair
+# up with or merge into the text that follows
+_UNSETTLED_TAIL_CHARS = " \t\r\n#*"
+_STAR_RUN_RE = re.compile(r'\*+')
+
+
+class CleanTextStreamer:
+    """
+    Applies a response cleaner (e.g. _clean_response) to streamed text,
+    emitting only output that later text cannot change, so the pieces add up
+    to the cleaned full text
+    """
+
+    def __init__(self, clean: Callable[[str], str]):
+        self.clean = clean
+        self.raw = ""
+        self.sent = ""
+
+    def feed(self, text: str) -> str:
+        """Add streamed text; return any newly settled cleaned characters"""
+        if not text:
+            return ""
+        self.raw += text
+        settled = self.raw.rstrip(_UNSETTLED_TAIL_CHARS)
+        # An odd number of '*' runs leaves a bold/italic span open: hold
+        # back from its opening run until the closing one arrives
+        while len(_STAR_RUN_RE.findall(settled)) % 2:
+            settled = settled[:settled.rfind('*') + 1].rstrip('*').rstrip(_UNSETTLED_TAIL_CHARS)
+        return self._emit(self.clean(settled))
+
+    def flush(self) -> str:
+        """Return the rest of the cleaned text once the streamed text is complete"""
+        return self._emit(self.clean(self.raw))
+
+    def _emit(self, cleaned: str) -> str:
+        # Only ever extend what was sent. Markdown odd enough to clean
+        # differently once more text arrives stalls the stream instead
+        if not cleaned.startswith(self.sent):
+            return ""
+        new = cleaned[len(self.sent):]
+        self.sent = cleaned
+        return new
+
+
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JsonFieldStreamer:
+    """Incrementally decodes one string field of a JSON object as it streams in"""
+
+    def __init__(self, field: str):
+        self.start_re = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ""
+        self.pos = None  # next undecoded index inside the field's value
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """Add streamed text; return any newly decoded characters of the field"""
+        if self.done:
+            return ""
+        self.buffer += chunk
+        if self.pos is None:
+            match = self.start_re.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        buf, i, out = self.buffer, self.pos, []
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                break
+            if c != '\\':
+                out.append(c)
+                i += 1
+                continue
+            # Escape sequence; stop if it is cut off and wait for more text
+            if i + 1 >= len(buf):
+                break
+            if buf[i + 1] != 'u':
+                out.append(_JSON_ESCAPES.get(buf[i + 1], buf[i + 1]))
+                i += 2
+                continue
+            if i + 6 > len(buf):
+                break
+            code = int(buf[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: needs its \uDCxx partner to form one character
+                if i + 12 > len(buf):
+                    break
+                low = int(buf[i + 8:i + 12], 16)
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                i += 12
+            else:
+                i += 6
+            out.append(chr(code))
+        self.pos = i
+        return "".join(out)
+
+
 class OpenAILLMService:
     def __init__(self):
         self.api_key = os.getenv('OPENAI_API_KEY')
@@ -17,29 +297,55 @@ class OpenAILLMService:
         self.model = os.getenv('LLM_MODEL', 'gpt-4o-mini')
         self.temperature = float(os.getenv('TEMPERATURE', '0.7'))
         self.max_tokens = int(os.getenv('MAX_TOKENS', '800')) # Increased for dual response
-
-        # Initialize persistent client for production efficiency
+        # Optional second model, raced in when the primary is slow or failing
+        self.fallback_model = os.getenv('LLM_FALLBACK_MODEL', '')
+        self.hedge_delay = float(os.getenv('LLM_HEDGE_DELAY', '3.0'))
+        # Fail fast on unreachable hosts; retry 429/5xx with jittered backoff
+        self.connect_timeout = float(os.getenv('LLM_CONNECT_TIMEOUT', '3'))
+        self.read_timeout = float(os.getenv('LLM_READ_TIMEOUT', '20'))
+        self.max_retries = int(os.getenv('LLM_MAX_RETRIES', '2'))
+        self.retry_backoff = float(os.getenv('LLM_RETRY_BACKOFF', '0.3'))
+        # Caps in-flight API calls so bursts queue here instead of tripping rate limits
+        self.concurrency = asyncio.Semaphore(int(os.getenv('LLM_MAX_CONCURRENCY', '16')))
+
+        # Initialize persistent client for production efficiency. HTTP/2 lets
+        # concurrent turns share one TLS connection as multiplexed streams
+        # instead of each waiting on or opening its own
         self.client = httpx.AsyncClient(
             base_url=self.base_url,
-            headers={"Authorization": f"Bearer {self.api_key}"},
-            timeout=25.0
+            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            http2=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=8)
         )
+        # Pooled keep-alive session for the sync helpers, so they reuse the
+        # TLS connection instead of handshaking on every call
+        self.session = requests.Session()
+        retry = Retry(total=self.max_retries, backoff_factor=self.retry_backoff,
+                      status_forcelist=_RETRY_STATUSES, allowed_methods=frozenset(["POST"]),
+                      raise_on_status=False)
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        })
 
         # Check if API key is properly configured
         if not self.api_key or self.api_key.strip() in ['your_openai_api_key_here', '']:
-            print("⚠️ AI service not configured. Using fallback responses.")
+            logger.warning("⚠️ AI service not configured. Using fallback responses.")
             self.api_configured = False
         else:
             self.api_configured = True
-            print(f"✅ AI service ready.")
+            logger.info("✅ AI service ready.")
+
+        # Concurrent translation requests share one LLM call
+        self.translation_batcher = TranslationBatcher(self)
 
     async def _call_openai_async(self, messages: List[Dict], max_tokens: Optional[int] = None, response_format: Optional[Dict] = None) -> str:
         """Async call to OpenAI API using persistent httpx client"""
         if not self.api_configured:
             return ""
 
-        import time
-        start_t = time.time()
         tokens = max_tokens or self.max_tokens
         
         payload = {
@@ -51,116 +357,241 @@ class OpenAILLMService:
         if response_format:
             payload["response_format"] = response_format
 
+        if not self.fallback_model:
+            return await self._post_completion(payload)
+        return await self._hedged_completion(payload)
+
+    async def _hedged_completion(self, payload: Dict) -> str:
+        """
+        Race the fallback model against a slow or failed primary call.
+        The fallback only starts once the primary errors or exceeds the hedge
+        delay; whichever returns text first wins and the other is cancelled.
+        """
+        primary = asyncio.create_task(self._post_completion(payload))
+        tasks = {primary}
         try:
-            resp = await self.client.post(
-                "/chat/completions",
-                json=payload
-            )
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+            if done and primary.result():
+                return primary.result()
+
+            pending = set() if done else {primary}
+            fallback = asyncio.create_task(self._post_completion({**payload, "model": self.fallback_model}))
+            tasks.add(fallback)
+            pending.add(fallback)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result():
+                        return task.result()
+            return ""
+        finally:
+            # Also runs when the caller is cancelled (e.g. client disconnect),
+            # so no request keeps its concurrency slot
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter for the given (0-based) retry attempt"""
+        return self.retry_backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def _post_completion(self, payload: Dict) -> str:
+        """Non-streaming /chat/completions request with retries; returns "" on failure"""
+        import time
+        start_t = time.time()
+        body = orjson.dumps(payload)
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self.concurrency:
+                        resp = await self.client.post("/chat/completions", content=body)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise
+                    logger.warning("⚠️ [AI] %s, retrying", e)
+                else:
+                    if resp.status_code not in _RETRY_STATUSES or attempt == self.max_retries:
+                        break
+                    logger.warning("⚠️ [AI] Service returned %s, retrying", resp.status_code)
+                await asyncio.sleep(self._retry_delay(attempt))
             
-            print(f"⏱️ [AI] Responded in {time.time() - start_t:.2f}s")
+            logger.debug("⏱️ [AI] %s responded in %.2fs", payload["model"], time.time() - start_t)
             
             if resp.status_code == 200:
-                result = resp.json()
+                result = orjson.loads(resp.content)
+                usage = result.get('usage') or {}
+                cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+                if cached_tokens:
+                    logger.debug("♻️ [AI] Prompt cache hit: %s/%s prompt tokens", cached_tokens, usage.get('prompt_tokens'))
                 if 'choices' in result and result['choices']:
                     return result['choices'][0]['message']['content'].strip()
             else:
-                print(f"❌ AI service error {resp.status_code}")
+                logger.error("❌ AI service error %s", resp.status_code)
         except Exception as e:
-            print(f"❌ AI service error: {e}")
+            logger.error("❌ AI service error: %s", e)
             
         return ""
 
+    async def _stream_openai_async(self, messages: List[Dict], max_tokens: Optional[int] = None, response_format: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Async streaming call to OpenAI API; yields content deltas as they arrive"""
+        if not self.api_configured:
+            return
+
+        import time
+        start_t = time.time()
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": max_tokens or self.max_tokens,
+            "stream": True,
+        }
+        if response_format:
+            payload["response_format"] = response_format
+
+        body = orjson.dumps(payload)
+        first = True
+        async with self.concurrency:
+            # Retries only happen before the first byte is yielded
+            for attempt in range(self.max_retries + 1):
+                try:
+                    request = self.client.build_request("POST", "/chat/completions", content=body)
+                    resp = await self.client.send(request, stream=True)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise
+                    logger.warning("⚠️ [AI] %s, retrying", e)
+                else:
+                    if resp.status_code == 200:
+                        break
+                    await resp.aclose()
+                    if resp.status_code not in _RETRY_STATUSES or attempt == self.max_retries:
+                        logger.error("❌ AI service error %s", resp.status_code)
+                        return
+                    logger.warning("⚠️ [AI] Service returned %s, retrying", resp.status_code)
+                await asyncio.sleep(self._retry_delay(attempt))
+            try:
+                async for delta in self._iter_sse_deltas(resp):
+                    if first:
+                        logger.debug("⏱️ [AI] First token in %.2fs", time.time() - start_t)
+                        first = False
+                    yield delta
+            finally:
+                await resp.aclose()
+        logger.debug("⏱️ [AI] Stream finished in %.2fs", time.time() - start_t)
+
+    async def _iter_sse_deltas(self, resp: httpx.Response) -> AsyncIterator[str]:
+        """Content deltas from a streaming chat completion response"""
+        async for line in resp.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[6:]
+            if data == "[DONE]":
+                break
+            chunk = orjson.loads(data)
+            if not chunk.get("choices"):
+                continue
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
     def _call_openai(self, messages: List[Dict], max_tokens: Optional[int] = None) -> str:
         """Low-level call to OpenAI API (Sync fallback)"""
         if not self.api_configured:
             return ""
 
         tokens = max_tokens or self.max_tokens
-        pass  # AI service call
         try:
-            resp = requests.post(
+            resp = self.session.post(
                 f"{self.base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
+                data=orjson.dumps({
                     "model": self.model,
                     "messages": messages,
                     "temperature": self.temperature,
                     "max_tokens": tokens,
                     "stream": False
-                },
-                timeout=30
+                }),
+                timeout=(self.connect_timeout, self.read_timeout)
             )
             
             if resp.status_code == 200:
-                result = resp.json()
+                result = orjson.loads(resp.content)
                 if 'choices' in result and result['choices']:
                     return result['choices'][0]['message']['content'].strip()
             else:
-                print(f"❌ AI service error {resp.status_code}")
+                logger.error("❌ AI service error %s", resp.status_code)
         except Exception as e:
-            print(f"❌ AI service error: {e}")
+            logger.error("❌ AI service error: %s", e)
             
-    async def generate_dual_response(self, user_message: str, context: str = "", conversation_history: list = None) -> Dict[str, str]:
+    async def generate_dual_response(self, user_message: str, context: str = "", conversation_history: list = None,
+                                     on_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict[str, str]:
         """
         Generate both English and Urdu responses in a single OpenAI call to minimize latency.
-        Returns Dict with 'en' and 'ur' keys.
+        Returns Dict with 'en' and 'ur' keys. If on_delta is given the completion is
+        streamed and English text is passed to it as it arrives.
         """
         if not self.api_configured:
             fallback = self._get_fallback_response(user_message, context)
             return {"en": fallback, "ur": fallback}
 
-        # Create the system prompt for dual-language JSON response
-        system_prompt = self._create_system_prompt() + """
-        CRITICAL: You MUST respond in JSON format with exactly two keys:
-        1. "en": Your natural English response.
-        2. "ur": Your natural Urdu response written in PROPER URDU SCRIPT (Arabic/Nastaliq characters - e.g. آپ کا کھانا تیار ہے).
-
-        URDU LANGUAGE RULES:
-        - Write "ur" ONLY in real Urdu script (Unicode Arabic characters like ا ب پ ت ث ج etc.).
-        - DO NOT use Roman Urdu (do not write 'aapka khana' - write 'آپ کا کھانا' instead).
-        - English loanwords that Pakistanis naturally use in Urdu conversation should stay in English. For example: restaurant names, food item names ("Biryani", "Karahi"), prices ("PKR 500"), and brand names ("Cheezious") should stay as they are.
-        - Speak naturally like a friendly Pakistani assistant, NOT like a formal translated document.
-        - CORRECT example: {"en": "Hello, how can I help you?", "ur": "ہیلو! میں آپ کی کیا مدد کر سکتا ہوں؟"}
-        - WRONG example: {"ur": "Hello, main aapki kya madad kar sakta hoon?"} ← This is Roman Urdu, NOT allowed.
-        """
-        
-        # Build user message with context
-        if context:
-            user_prompt = f"Customer asked: \"{user_message}\"\n\nContext:\n{context}"
-        else:
-            user_prompt = user_message
+        # Static system prompt first so the provider can cache the prefix;
+        # everything per-request (history, context, query) goes after it
+        system_prompt = _DUAL_SYSTEM_PROMPT
         
-        messages = [{"role": "system", "content": system_prompt}]
-        if conversation_history:
-            # Increased history window from 4 to 10 for better memory of names/context
-            for msg in conversation_history[-10:]:
-                messages.append(msg)
-        messages.append({"role": "user", "content": user_prompt})
+        # Increased history window from 4 to 10 for better memory of names/context
+        messages = self._build_messages(system_prompt, user_message, context, conversation_history, 10)
 
         try:
-            raw_response = await self._call_openai_async(
-                messages, 
-                # Strict JSON enforcement for dual output
-                response_format={"type": "json_object"}
-            )
+            if on_delta:
+                raw_response = await self._stream_dual_response(messages, on_delta)
+            else:
+                raw_response = await self._call_openai_async(
+                    messages, 
+                    # Strict JSON enforcement for dual output
+                    response_format={"type": "json_object"}
+                )
             
             if not raw_response:
                 fallback = self._get_fallback_response(user_message, context)
                 return {"en": fallback, "ur": fallback}
             
-            result = json.loads(raw_response)
+            try:
+                result = orjson.loads(raw_response)
+            except orjson.JSONDecodeError:
+                # Model ignored JSON mode: keep its text as the English answer
+                # and fall back to a separate translation call for Urdu
+                logger.warning("⚠️ Dual response was not valid JSON, translating separately")
+                en = self._clean_response(raw_response)
+                return {"en": en, "ur": await self.translate_to_urdu_async(en)}
             return {
                 "en": self._clean_response(result.get("en", "")),
                 "ur": result.get("ur", "").strip()
             }
         except Exception as e:
-            print(f"❌ Error in generate_dual_response: {e}")
+            logger.error("❌ Error in generate_dual_response: %s", e)
             fallback = self._get_fallback_response(user_message, context)
             return {"en": fallback, "ur": fallback}
 
+    async def _stream_dual_response(self, messages: List[Dict], on_delta: Callable[[str], Awaitable[None]]) -> str:
+        """
+        Stream a JSON-mode dual response, forwarding the "en" text as it arrives,
+        cleaned the same way as the final text; returns the raw JSON
+        """
+        parts = []
+        en_stream = JsonFieldStreamer("en")
+        en_clean = CleanTextStreamer(self._clean_response)
+        async for delta in self._stream_openai_async(messages, response_format={"type": "json_object"}):
+            parts.append(delta)
+            if en_stream.done:
+                continue
+            text = en_clean.feed(en_stream.feed(delta))
+            if en_stream.done:
+                # The "en" value is complete; send what was held back
+                text += en_clean.flush()
+            if text:
+                await on_delta(text)
+        return "".join(parts).strip()
+
     def generate_response(self, user_message: str, context: str = "", conversation_history: list = None) -> str:
         """Generate a response using OpenAI API with RAG context (Sync)"""
         
@@ -168,20 +599,7 @@ class OpenAILLMService:
         if not self.api_configured:
             return self._get_fallback_response(user_message, context)
         
-        # Create the system prompt for voice-like conversation
-        system_prompt = self._create_system_prompt()
-        
-        # Build user message with context
-        if context:
-            user_prompt = f"Customer asked: \"{user_message}\"\n\nContext:\n{context}"
-        else:
-            user_prompt = user_message
-        
-        messages = [{"role": "system", "content": system_prompt}]
-        if conversation_history:
-            for msg in conversation_history[-6:]:
-                messages.append(msg)
-        messages.append({"role": "user", "content": user_prompt})
+        messages = self._build_messages(_SYSTEM_PROMPT, user_message, context, conversation_history, 6)
 
         try:
             raw_response = self._call_openai(messages)
@@ -190,50 +608,34 @@ class OpenAILLMService:
             
             return self._clean_response(raw_response)
         except Exception as e:
-            print(f"❌ Error in generate_response: {e}")
+            logger.error("❌ Error in generate_response: %s", e)
             return self._get_fallback_response(user_message, context)
 
+    def _build_messages(self, system_prompt: str, user_message: str, context: str = "",
+                        conversation_history: list = None, history_window: int = 10) -> List[Dict]:
+        """
+        Order messages static-first: the constant system prompt, then history,
+        then the retrieved context as its own user message, then the query.
+        Keeping per-query context out of the system message leaves the cached
+        system prefix intact across every RAG query.
+        """
+        history = conversation_history[-history_window:] if conversation_history else ()
+        if context:
+            return [
+                {"role": "system", "content": system_prompt},
+                *history,
+                {"role": "user", "content": f"Context:\n{context}"},
+                {"role": "user", "content": f"Customer asked: \"{user_message}\""},
+            ]
+        return [
+            {"role": "system", "content": system_prompt},
+            *history,
+            {"role": "user", "content": user_message},
+        ]
+
     def is_configured(self) -> bool:
         return self.api_configured
     
-    def _create_system_prompt(self) -> str:
-        """Create a natural, conversational system prompt for phone-call responses"""
-        
-        system_prompt = """You are a friendly AI voice-ordering assistant for a multi-restaurant food platform.
-Your responses are warm, natural, and conversational (1-3 sentences max). You speak like a knowledgeable friend helping someone decide what to eat.
-
-CONVERSATIONAL STYLE:
-- Speak naturally, like a phone assistant. No markdown, no bullet points.
-- Use the customer's name occasionally if they shared it.
-- When listing items, read them naturally: "From Ranchers, you have Malai Tikka for PKR 500 and Smoky BBQ Ranch Burger."
-- If the user mixes languages (Roman Urdu/English), respond in the same tone.
-- Be helpful and proactive — if items are limited, suggest what IS available and ask what they'd like.
-
-=== STRICT MENU RULES (NEVER BREAK THESE) ===
-
-1. ORDERABLE ITEMS: ONLY items in [SECTION: MENU ITEMS] with a PKR price AND an Item ID can be offered for ordering.
-2. IDENTITY ITEMS: Items in [SECTION: RESTAURANT IDENTITY] under "Specialties" (e.g., Chicken Kiev, Loaded Burgers) are DESCRIPTIONS of the restaurant style — NOT orderable unless also in [SECTION: MENU ITEMS].
-3. If asked about an item that exists in IDENTITY but NOT in MENU ITEMS:
-   → Say naturally: "That's not on the current menu, but from [Restaurant] you can order [list MENU ITEMS]."
-   → Do NOT say "That's listed as a specialty" — that sounds robotic.
-4. If an item has PKR 0 or no price, say "the price isn't listed" — don't quote 0.
-5. NEVER invent or guess prices. Only quote what's in the context.
-6. If the menu context has no items at all, say: "I don't have the full menu right now, but I can check — what are you looking for?"
-
-=== MULTI-RESTAURANT RULES ===
-7. Only mention restaurants that appear in the provided context.
-8. When a user switches restaurants, acknowledge smoothly: "Sure, let me check Cheezious for you!"
-9. Track which restaurant the user is focused on from recent conversation — don't jump restaurant contexts randomly.
-10. If confused about which restaurant the user means, ask once: "Did you mean Ranchers or Cheezious?"
-11. 'koi aur', 'aur koi', 'Iske alava' = user wants to know about OTHER restaurants — list all available.
-
-=== SUMMARY & CONTEXT RULES ===
-12. The conversation SUMMARY tells you what was discussed before. Trust it but verify against the current MENU CONTEXT.
-13. If the summary mentions an item but it's not in the current MENU CONTEXT, do not confirm it — say it's not currently available.
-14. If the user says "wahi wala", "pehle wala", "us wali cheez" — refer to the most recent item discussed in history.
-"""
-        return system_prompt
-
     async def generate_summary(self, existing_summary: str, new_messages: List[Dict]) -> str:
         """Generate a concise, factual summary of the conversation so far (Async)"""
         if not self.api_configured:
@@ -241,20 +643,10 @@ CONVERSATIONAL STYLE:
 
         messages_text = "\n".join([f"{m['role']}: {m['content']}" for m in new_messages])
         
-        prompt = f"""Existing Summary: "{existing_summary}"
-
-New messages:
-{messages_text}
-
-Update the summary in 1-2 sentences. Include:
-- Customer's name (if shared)
-- Which restaurant(s) the customer is currently interested in
-- Which items have been discussed or ordered
-- Whether the customer has switched restaurants
-Return ONLY the updated summary, no labels."""
+        prompt = "".join(['Existing Summary: "', existing_summary, '"\n\nNew messages:\n', messages_text])
 
         messages = [
-            {"role": "system", "content": "You are a factual summarization assistant. Track restaurant context carefully."},
+            {"role": "system", "content": _SUMMARY_PROMPT},
             {"role": "user", "content": prompt}
         ]
         
@@ -262,16 +654,22 @@ Return ONLY the updated summary, no labels."""
             response = await self._call_openai_async(messages, max_tokens=180)
             return response.strip()
         except Exception as e:
-            print(f"⚠️ Summary failed: {e}")
+            logger.warning("⚠️ Summary failed: %s", e)
             return existing_summary
 
+    async def translate_to_urdu_async(self, text: str) -> str:
+        """Translate text to Urdu script (Async)"""
+        if not self.api_configured or not text:
+            return text
+        return await self.translation_batcher.translate(text)
+
     def translate_to_urdu(self, text: str) -> str:
         """Translate text to Urdu script (Arabic characters)"""
         if not self.api_configured:
             return text
 
         messages = [
-            {"role": "system", "content": "Translate the text into natural Urdu script (Arabic characters). No English alphabet."},
+            {"role": "system", "content": _URDU_TRANSLATION_PROMPT},
             {"role": "user", "content": f"Translate this to Urdu script: {text}"}
         ]
         
@@ -279,7 +677,7 @@ Return ONLY the updated summary, no labels."""
             response = self._call_openai(messages, max_tokens=300)
             return response.strip()
         except Exception as e:
-            print(f"⚠️ Translation failed: {e}")
+            logger.warning("⚠️ Translation failed: %s", e)
             return text
 
     def _clean_response(self, response: str) -> str:
@@ -288,10 +686,10 @@ Return ONLY the updated summary, no labels."""
             return response
         
         # Simple cleanup as GPT-4o-mini is usually very good at following instructions
-        cleaned = re.sub(r'\*\*([^*]+)\*\*', r'\1', response)
-        cleaned = re.sub(r'\*([^*]+)\*', r'\1', cleaned)
-        cleaned = re.sub(r'#+\s*', '', cleaned)
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = _MARKDOWN_BOLD_RE.sub(r'\1', response)
+        cleaned = _MARKDOWN_ITALIC_RE.sub(r'\1', cleaned)
+        cleaned = _MARKDOWN_HEADING_RE.sub('', cleaned)
+        cleaned = _WHITESPACE_RE.sub(' ', cleaned)
         return cleaned.strip()
     
     def _get_fallback_response(self, user_message: str, context: str = "") -> str:
@@ -305,16 +703,15 @@ Return ONLY the updated summary, no labels."""
         if not order_items:
             return "Your cart is empty."
         
-        summary = "Here is your order summary:\n"
+        lines = ["Here is your order summary:\n"]
         total = 0
         for item in order_items:
             price = item.get('price', '0')
-            try:
-                numeric_price = int(re.sub(r'\D', '', price)) if price else 0
-                total += numeric_price
-            except: pass
-            summary += f"- {item['name']}: {price}\n"
+            digits = _NON_DIGIT_RE.sub('', str(price)) if price else ''
+            if digits:
+                total += int(digits)
+            lines.append(f"- {item['name']}: {price}\n")
         
-        summary += f"\nTotal: Rs. {total}. Would you like to confirm?"
-        return summary
+        lines.append(f"\nTotal: Rs. {total}. Would you like to confirm?")
+        return "".join(lines)
 
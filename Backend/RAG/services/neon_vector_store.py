@@ -16,8 +16,12 @@ Schema (created on first use):
 """
 
 import os
+import time
+import threading
+import contextlib
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 import numpy as np
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
@@ -26,6 +30,28 @@ load_dotenv()
 
 _EMBEDDING_DIM = 384   # all-MiniLM-L6-v2
 
+# HNSW graph parameters (pgvector >= 0.5). ef_search is the candidate list
+# size per probe: higher means better recall, slower search
+_HNSW_M = int(os.getenv("HNSW_M", "16"))
+_HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "128"))
+_HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# Index and compare embeddings at half precision (pgvector >= 0.7 halfvec).
+# The column keeps full float32 vectors; only the HNSW graph is built over the
+# halfvec cast, halving its size, and searches use the same cast so the planner
+# picks the index. MiniLM cosine scores move by ~1e-3 at fp16
+_HALFVEC_INDEX = os.getenv("EMBEDDING_HALFVEC_INDEX", "true").lower() == "true"
+if _HALFVEC_INDEX:
+    _SEARCH_TYPE = f"halfvec({_EMBEDDING_DIM})"
+    _SEARCH_EXPR = f"(embedding::{_SEARCH_TYPE})"
+    _SEARCH_OPS = "halfvec_cosine_ops"
+    _HNSW_INDEX, _STALE_HNSW_INDEX = "idx_restaurant_embeddings_hnsw_half", "idx_restaurant_embeddings_hnsw"
+else:
+    _SEARCH_TYPE = "vector"
+    _SEARCH_EXPR = "embedding"
+    _SEARCH_OPS = "vector_cosine_ops"
+    _HNSW_INDEX, _STALE_HNSW_INDEX = "idx_restaurant_embeddings_hnsw", "idx_restaurant_embeddings_hnsw_half"
+
 # ─── connection ──────────────────────────────────────────────────────────────
 
 def _get_conn():
@@ -36,6 +62,70 @@ def _get_conn():
     return psycopg2.connect(url)
 
 
+# Searches and chunk lookups run on every query; reusing connections skips a
+# TLS handshake to Neon per call. Neon drops connections when its compute
+# suspends (5 idle minutes by default), so long-idle ones are replaced
+_POOL_MAX_CONN = int(os.getenv("NEON_POOL_MAX_CONN", "10"))
+_POOL_IDLE_SECONDS = float(os.getenv("NEON_POOL_IDLE_SECONDS", "240"))
+
+_pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+_last_used: Dict[int, float] = {}   # id(conn) -> time it went back to the pool
+
+
+def _get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """Process-wide read pool, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                url = os.getenv("NEON_DATABASE_URL")
+                if not url:
+                    raise RuntimeError("NEON_DATABASE_URL is not set in RAG .env")
+                _pool = psycopg2.pool.ThreadedConnectionPool(0, _POOL_MAX_CONN, url)
+    return _pool
+
+
+@contextlib.contextmanager
+def _read_conn():
+    """
+    Borrow a pooled connection for one read-only query. Falls back to a fresh
+    connection (closed afterwards) when every pooled one is in use.
+    """
+    pool = _get_pool()
+    try:
+        conn = pool.getconn()
+        last = _last_used.pop(id(conn), None)
+        while last is not None and time.monotonic() - last > _POOL_IDLE_SECONDS:
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+            last = _last_used.pop(id(conn), None)
+    except psycopg2.pool.PoolError:
+        conn = None
+    if conn is None:
+        conn = _get_conn()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if not broken:
+            try:
+                conn.rollback()   # end the read transaction and its SET LOCALs
+                _last_used[id(conn)] = time.monotonic()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken)
+
+
 # ─── one-time setup ──────────────────────────────────────────────────────────
 
 def setup_table() -> bool:
@@ -74,12 +164,16 @@ def setup_table() -> bool:
                     END $$;
                 """)
 
-                # Index for fast cosine-similarity search
-                cur.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_restaurant_embeddings_vec
+                # HNSW index for fast cosine-similarity search. Unlike the
+                # ivfflat index it replaces, it needs no training data, so it
+                # stays accurate when built on an empty table and as rows grow
+                cur.execute("DROP INDEX IF EXISTS idx_restaurant_embeddings_vec;")
+                cur.execute(f"DROP INDEX IF EXISTS {_STALE_HNSW_INDEX};")
+                cur.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {_HNSW_INDEX}
                     ON restaurant_embeddings
-                    USING ivfflat (embedding vector_cosine_ops)
-                    WITH (lists = 50);
+                    USING hnsw ({_SEARCH_EXPR} {_SEARCH_OPS})
+                    WITH (m = {_HNSW_M}, ef_construction = {_HNSW_EF_CONSTRUCTION});
                 """)
 
                 # Index for restaurant-id lookups / deletions
@@ -126,9 +220,11 @@ def upsert_chunks(
                     (restaurant_id,),
                 )
 
+                # One bulk ndarray -> list conversion instead of one per row
+                emb_lists = embeddings.tolist() if embeddings is not None else None
                 rows = []
                 for i, chunk in enumerate(chunks):
-                    emb = embeddings[i].tolist() if embeddings is not None else None
+                    emb = emb_lists[i] if emb_lists is not None else None
                     tag = meta_tags[i] if meta_tags is not None else None
                     
                     rows.append((
@@ -161,65 +257,113 @@ def upsert_chunks(
 
 # ─── read / search ────────────────────────────────────────────────────────────
 
+_SEARCH_COLUMNS = "restaurant_id, restaurant_name, chunk_index, content, meta_tag, pdf_filename"
+
+
+def _search_sql(vec_expr: str, restaurant_id: Optional[str], restaurant_ids: Optional[List[str]]) -> str:
+    """
+    Nearest-neighbour SELECT for one query vector, taking %(rid)s / %(rids)s
+    and %(top_k)s params. Several restaurants get their own top_k each
+    through a LATERAL join, so one restaurant's chunks cannot crowd out the
+    others'.
+    """
+    if restaurant_ids and not restaurant_id:
+        return f"""
+                SELECT c.*
+                FROM unnest(%(rids)s::text[]) AS r(rid)
+                CROSS JOIN LATERAL (
+                    SELECT {_SEARCH_COLUMNS},
+                        1 - ({_SEARCH_EXPR} <=> {vec_expr}) AS similarity
+                    FROM restaurant_embeddings
+                    WHERE restaurant_id = r.rid
+                    ORDER BY {_SEARCH_EXPR} <=> {vec_expr}
+                    LIMIT %(top_k)s
+                ) c
+                """
+    where = "WHERE restaurant_id = %(rid)s" if restaurant_id else ""
+    return f"""
+                SELECT {_SEARCH_COLUMNS},
+                    1 - ({_SEARCH_EXPR} <=> {vec_expr}) AS similarity
+                FROM restaurant_embeddings
+                {where}
+                ORDER BY {_SEARCH_EXPR} <=> {vec_expr}
+                LIMIT %(top_k)s
+                """
+
+
 def search_similar(
     query_embedding: np.ndarray,
     top_k: int = 5,
     restaurant_id: Optional[str] = None,
+    restaurant_ids: Optional[List[str]] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Return the top_k most similar chunks using cosine distance.
-    Optionally filter by restaurant_id.
+    Return the most similar chunks using cosine distance, best first.
+    Optionally filter by restaurant_id (top_k rows), or by restaurant_ids
+    (top_k rows per restaurant).
     """
-    vec = query_embedding.tolist()
+    sql = _search_sql(f"%(vec)s::{_SEARCH_TYPE}", restaurant_id, restaurant_ids)
+    if restaurant_ids and not restaurant_id:
+        sql += "ORDER BY c.similarity DESC"
+    params = {
+        "vec": query_embedding.tolist(),
+        "rid": restaurant_id,
+        "rids": list(restaurant_ids or []),
+        "top_k": top_k,
+    }
 
-    conn = _get_conn()
-    try:
+    with _read_conn() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            if restaurant_id:
-                cur.execute(
-                    """
-                    SELECT
-                        restaurant_id,
-                        restaurant_name,
-                        chunk_index,
-                        content,
-                        meta_tag,
-                        pdf_filename,
-                        1 - (embedding <=> %s::vector) AS similarity
-                    FROM restaurant_embeddings
-                    WHERE restaurant_id = %s
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s
-                    """,
-                    (vec, restaurant_id, vec, top_k),
-                )
-            else:
-                cur.execute(
-                    """
-                    SELECT
-                        restaurant_id,
-                        restaurant_name,
-                        chunk_index,
-                        content,
-                        meta_tag,
-                        pdf_filename,
-                        1 - (embedding <=> %s::vector) AS similarity
-                    FROM restaurant_embeddings
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s
-                    """,
-                    (vec, vec, top_k),
-                )
+            cur.execute("SET LOCAL hnsw.ef_search = %s", (_HNSW_EF_SEARCH,))
+            cur.execute(sql, params)
             rows = cur.fetchall()
         return [dict(r) for r in rows]
-    finally:
-        conn.close()
+
+
+def search_similar_batch(
+    query_embeddings: np.ndarray,
+    top_k: int = 5,
+    restaurant_id: Optional[str] = None,
+    restaurant_ids: Optional[List[str]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Run several nearest-neighbour searches in one round trip.
+    Returns one list per row of query_embeddings, in the same order, each
+    limited like search_similar's.
+    """
+    query_embeddings = np.atleast_2d(query_embeddings)
+    vecs = [str(row.tolist()) for row in query_embeddings]
+    sql = _search_sql(f"q.vec::{_SEARCH_TYPE}", restaurant_id, restaurant_ids)
+    params = {
+        "vecs": vecs,
+        "rid": restaurant_id,
+        "rids": list(restaurant_ids or []),
+        "top_k": top_k,
+    }
+
+    with _read_conn() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute("SET LOCAL hnsw.ef_search = %s", (_HNSW_EF_SEARCH,))
+            cur.execute(
+                f"""
+                SELECT q.ord, s.*
+                FROM unnest(%(vecs)s::text[]) WITH ORDINALITY AS q(vec, ord)
+                CROSS JOIN LATERAL ({sql}) s
+                ORDER BY q.ord, s.similarity DESC
+                """,
+                params,
+            )
+            rows = cur.fetchall()
+        results: List[List[Dict[str, Any]]] = [[] for _ in vecs]
+        for r in rows:
+            row = dict(r)
+            results[row.pop("ord") - 1].append(row)
+        return results
 
 
 def get_restaurant_chunks(restaurant_id: str) -> List[Dict[str, Any]]:
     """Return all chunks for a specific restaurant_id, ordered by chunk_index."""
-    conn = _get_conn()
-    try:
+    with _read_conn() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute(
                 """
@@ -239,18 +383,46 @@ def get_restaurant_chunks(restaurant_id: str) -> List[Dict[str, Any]]:
             )
             rows = cur.fetchall()
         return [dict(r) for r in rows]
-    finally:
-        conn.close()
+
+
+def get_restaurant_chunks_batch(restaurant_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    get_restaurant_chunks for several restaurants in one round trip.
+    Returns restaurant_id -> chunks ordered by chunk_index (empty if none).
+    """
+    results: Dict[str, List[Dict[str, Any]]] = {rid: [] for rid in restaurant_ids}
+    if not restaurant_ids:
+        return results
+
+    with _read_conn() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT
+                    restaurant_id,
+                    restaurant_name,
+                    chunk_index,
+                    content,
+                    meta_tag,
+                    pdf_filename,
+                    1.0 AS similarity -- No vector comparison here, so use base similarity
+                FROM restaurant_embeddings
+                WHERE restaurant_id = ANY(%s)
+                ORDER BY restaurant_id, chunk_index ASC
+                """,
+                (list(restaurant_ids),),
+            )
+            rows = cur.fetchall()
+        for r in rows:
+            results[r["restaurant_id"]].append(dict(r))
+        return results
 
 
 def get_all_restaurant_ids() -> List[str]:
     """Return distinct restaurant IDs that have embeddings in NeonDB."""
-    conn = _get_conn()
-    try:
+    with _read_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 "SELECT DISTINCT restaurant_id FROM restaurant_embeddings"
             )
             return [row[0] for row in cur.fetchall()]
-    finally:
-        conn.close()
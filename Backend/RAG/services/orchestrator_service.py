@@ -1,7 +1,32 @@
+import os
 import asyncio
-from services.basic_handler import BasicHandler
+import logging
+from services.basic_handler import BasicHandler, small_talk_kind
 from services.complex_handler import ComplexHandler
-from services.order_handler import OrderHandler
+from services.order_handler import OrderHandler, is_order_intent
+from services.response_cache import QueryCache
+from services.semantic_cache import SemanticCache
+
+logger = logging.getLogger("rag.orchestrator")
+
+_CLASSIFIER_PROMPT = """You are a concise query classifier for a restaurant voice assistant.
+
+Classify the user's NEW QUERY into exactly one of these:
+1. GREETING: Simple hellos, goodbyes, well-being updates.
+2. GENERAL: Non-restaurant, non-food questions only.
+3. ORDER: Intent to place an order, add items, remove items, view cart, or CONFIRM an order (even if it's a short "yes", "ok", or "confirm").
+4. COMPLEX: Menu/restaurant-specific questions, browsing options, asking about a different restaurant.
+
+RULES:
+- If query is "yes", "confirm", "ok", or "done" and history shows an order context, use ORDER.
+- Users often mispronounce "Cheezious" as "serious", "jesus", "sheesh", or "chijen". Treat those as restaurant mentions → COMPLEX.
+- If query mentions food items or brand names for ordering, use ORDER.
+- If query asks about a restaurant menu, options, or details, use COMPLEX.
+- CRITICAL: If user says "koi aur restaurant", "aur restaurant hai", "kisi aur restaurant", "another restaurant", "different restaurant" → use COMPLEX (they want to explore other options!).
+- "koi aur option", "kuchh aur", "something else" about food → COMPLEX.
+- Only use GREETING for pure greetings with NO food/restaurant mention.
+
+Return ONLY the category name."""
 
 class OrchestratorService:
     def __init__(self, llm_service, rag_system, session_manager=None):
@@ -14,14 +39,39 @@ class OrchestratorService:
         self.complex_agent = ComplexHandler(llm_service, rag_system)
         self.order_agent = OrderHandler(llm_service, rag_system)
         
-    async def handle_query(self, query: str, session_id: str = "default_session", user_id: str = None) -> dict:
+        # Exact-repeat cache for final responses (voice clients often re-submit
+        # the same transcript seconds apart)
+        self.response_cache = QueryCache(
+            max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "2000")),
+            ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+        )
+        # Paraphrase cache for menu questions ("pizza prices?" / "how much is pizza")
+        self.semantic_cache = SemanticCache(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+        )
+        # Classifier verdicts keyed by the full classifier input (summary,
+        # recent messages and query, normalized); see classify_query for the
+        # turns that skip it
+        self.classification_cache = QueryCache(
+            max_size=int(os.getenv("CLASSIFIER_CACHE_SIZE", "4096")),
+            ttl_seconds=int(os.getenv("CLASSIFIER_CACHE_TTL", "3600"))
+        )
+        
+    def clear_response_caches(self):
+        """Forget cached answers, e.g. after restaurant data was re-ingested"""
+        self.response_cache.clear()
+        self.semantic_cache.clear()
+        
+    async def handle_query(self, query: str, session_id: str = "default_session", user_id: str = None, on_delta=None) -> dict:
         """
         Processes a query by classifying it and delegating to the right specialized agent.
-        Now manages session history and summaries.
+        Now manages session history and summaries. on_delta, if given, receives the
+        English response text as it streams from the LLM.
         """
         import time
         start_time = time.time()
-        print(f"⏱️ [Orchestrator] Starting processing: '{query[:50]}...' user_id: {user_id}")
+        logger.debug("⏱️ [Orchestrator] Starting processing: '%s...' user_id: %s", query[:50], user_id)
         
         # 1. Manage Session - Record user message
         if self.session_manager:
@@ -32,30 +82,88 @@ class OrchestratorService:
         else:
             history = []
             summary = ""
-        print(f"⏱️ [Orchestrator] Session context retrieved in {time.time() - start_time:.2f}s")
+        logger.debug("⏱️ [Orchestrator] Session context retrieved in %.2fs", time.time() - start_time)
             
-        # 2. Classify
+        # Answers depend on the conversation so far ("yes", "tell me more", the
+        # customer's name), so only turns with no prior history or summary use
+        # the response caches (see step 3)
+        context_free = not summary and len(history) <= 1  # history holds this query
+        
+        # 2. Classify. Retrieval for menu questions only needs the query and
+        # summary, so start it alongside the classifier's LLM round-trip rather
+        # than after it; the result is simply dropped for other categories.
+        # The semantic-cache key embedding is likewise computed up front, on
+        # the turns that can use the cache. Greetings and explicit cart
+        # requests are classified by regex (see classify_query) and never use
+        # retrieval, so they skip both
         class_start = time.time()
+        prefetch = None
+        embedding_prefetch = None
+        rule_classified = self.llm_service and (small_talk_kind(query) or is_order_intent(query))
+        if self.rag_system and not rule_classified:
+            prefetch = asyncio.create_task(asyncio.to_thread(self.rag_system.process_query, query, summary))
+            # Mark failures as retrieved when the result ends up unused
+            prefetch.add_done_callback(lambda t: t.cancelled() or t.exception())
+            if context_free and self.rag_system.embedding_model is not None:
+                embedding_prefetch = asyncio.create_task(asyncio.to_thread(
+                    self.rag_system.embedding_model.encode, query, normalize_embeddings=True
+                ))
+                embedding_prefetch.add_done_callback(lambda t: t.cancelled() or t.exception())
         category = await self.classify_query(query, session_id)
-        print(f"🎯 [Orchestrator] Classified as: {category} in {time.time() - class_start:.2f}s")
+        logger.debug("🎯 [Orchestrator] Classified as: %s in %.2fs", category, time.time() - class_start)
+        
+        # 3. Serve exact repeats from cache. Orders mutate the cart so they are
+        # never cached. Context-free answers depend on nothing but the query,
+        # so they are shared across sessions.
+        cache_key = None
+        cached = None
+        if category != "order" and context_free:
+            cache_key = self.response_cache.make_key(category, query)
+            cached = self.response_cache.get(cache_key)
         
-        # 3. Delegate with context
+        # Menu questions also match paraphrases by query-embedding similarity.
+        # Answers depend on which restaurant the turn resolved to, so the
+        # lookup waits for retrieval and is scoped to those restaurants too
+        query_embedding = None
+        semantic_scope = None
+        rag_result = None
+        if cached is None and category == "complex" and self.rag_system:
+            if prefetch:
+                try:
+                    rag_result = await prefetch
+                except Exception as e:
+                    logger.warning("⚠️ [Orchestrator] Prefetched retrieval failed, retrying: %s", e)
+            if cache_key and rag_result is not None and embedding_prefetch:
+                restaurant_ids = sorted(r["id"] for r in rag_result.get("detected_restaurants", []))
+                semantic_scope = ','.join(restaurant_ids)
+                query_embedding = await embedding_prefetch
+                cached = self.semantic_cache.get(semantic_scope, query_embedding)
+        
+        # 4. Delegate with context
         delegate_start = time.time()
         result: dict
-        if category == "basic":
-            result = await self.basic_agent.handle(query, history, summary)
+        if cached is not None:
+            result = cached
+            logger.debug("⚡ [Orchestrator] Served from response cache")
+        elif category == "basic":
+            result = await self.basic_agent.handle(query, history, summary, on_delta)
         elif category == "order":
-            result = await self.order_agent.handle(query, history, summary, session_id, user_id)
+            result = await self.order_agent.handle(query, history, summary, session_id, user_id, on_delta)
         else:
-            result = await self.complex_agent.handle(query, history, summary)
-        print(f"⏱️ [Orchestrator] Agent handled in {time.time() - delegate_start:.2f}s")
+            result = await self.complex_agent.handle(query, history, summary, rag_result, on_delta)
+        logger.debug("⏱️ [Orchestrator] Agent handled in %.2fs", time.time() - delegate_start)
+        
+        if cache_key and cached is None and result.get("response_en") != self.llm_service._get_fallback_response(query):
+            self.response_cache.put(cache_key, result)
+            if query_embedding is not None:
+                self.semantic_cache.put(semantic_scope, query_embedding, result)
             
-        # 4. Manage Session - Record response and update summary
+        # 5. Manage Session - Record response and update summary
         if self.session_manager:
             assistant_response = result.get("response", "")
             self.session_manager.add_message(session_id, "assistant", assistant_response)
             
-            # 5. CART INJECTION: Ensure cart is always returned if available
+            # 6. CART INJECTION: Ensure cart is always returned if available
             if session_id in self.order_agent.order_context:
                 ctx_items = self.order_agent.order_context[session_id].get("items", [])
                 if ctx_items and not result.get("cart"):
@@ -65,7 +173,7 @@ class OrchestratorService:
             # Fire-and-forget summary update (background task)
             asyncio.create_task(self.update_session_summary(session_id))
             
-        print(f"✅ [Orchestrator] Total processing time: {time.time() - start_time:.2f}s")
+        logger.debug("✅ [Orchestrator] Total processing time: %.2fs", time.time() - start_time)
         return result
 
     async def classify_query(self, query: str, session_id: str = None) -> str:
@@ -76,6 +184,13 @@ class OrchestratorService:
         if not self.llm_service:
             return "complex"
 
+        # Pure greetings / thanks / goodbyes and explicit cart requests need no
+        # LLM round-trip to classify
+        if small_talk_kind(query):
+            return "basic"
+        if is_order_intent(query):
+            return "order"
+
         # Get context to help classification (especially for confirmations like "yes" or "ok")
         summary = ""
         last_msgs = ""
@@ -85,32 +200,23 @@ class OrchestratorService:
             history = ctx.get("history", [])
             last_msgs = "\n".join([f"{m['role']}: {m['content']}" for m in history[-3:]])
 
-        prompt = f"""You are a query classifier for a restaurant voice assistant.
-        
-        CONTEXT SUMMARY: {summary}
-        RECENT MESSAGES:
-        {last_msgs}
-        
-        Classify the user query into exactly one of these:
-        1. GREETING: Simple hellos, goodbyes, well-being updates.
-        2. GENERAL: Non-restaurant, non-food questions only.
-        3. ORDER: Intent to place an order, add items, remove items, view cart, or CONFIRM an order (even if it's a short "yes", "ok", or "confirm").
-        4. COMPLEX: Menu/restaurant-specific questions, browsing options, asking about a different restaurant.
-        
-        NEW QUERY: "{query}"
-        
-        RULES:
-        - If query is "yes", "confirm", "ok", or "done" and history shows an order context, use ORDER.
-        - Users often mispronounce "Cheezious" as "serious", "jesus", "sheesh", or "chijen". Treat those as restaurant mentions → COMPLEX.
-        - If query mentions food items or brand names for ordering, use ORDER.
-        - If query asks about a restaurant menu, options, or details, use COMPLEX.
-        - CRITICAL: If user says "koi aur restaurant", "aur restaurant hai", "kisi aur restaurant", "another restaurant", "different restaurant" → use COMPLEX (they want to explore other options!).
-        - "koi aur option", "kuchh aur", "something else" about food → COMPLEX.
-        - Only use GREETING for pure greetings with NO food/restaurant mention.
-        
-        Return ONLY the category name."""
+        # Verdicts are cached by the full classifier input, so a "yes" that
+        # meant ORDER in one conversation is never replayed in another. Short
+        # replies ("yes", "ok", "haan") are never cached, and neither are turns
+        # with an open cart, which turns such replies into order confirmations
+        cache_key = None
+        if (len(query.split()) > 2
+                and not (session_id and self.order_agent.order_context.get(session_id, {}).get("items"))):
+            cache_key = self.classification_cache.make_key(summary, last_msgs, query)
+            cached = self.classification_cache.get(cache_key)
+            if cached is not None:
+                return cached["category"]
+
+        # Static instructions go in the system message so every classification
+        # shares a cacheable prompt prefix; only the per-turn state follows
+        prompt = f"CONTEXT SUMMARY: {summary}\nRECENT MESSAGES:\n{last_msgs}\n\nNEW QUERY: \"{query}\""
 
-        messages = [{"role": "system", "content": "You are a concise classifier."}, 
+        messages = [{"role": "system", "content": _CLASSIFIER_PROMPT},
                     {"role": "user", "content": prompt}]
 
         try:
@@ -119,14 +225,17 @@ class OrchestratorService:
             response = response.strip().upper()
             
             if "GREETING" in response or "GENERAL" in response:
-                return "basic"
+                category = "basic"
             elif "ORDER" in response:
-                return "order"
+                category = "order"
             else:
-                return "complex"
+                category = "complex"
+            if cache_key:
+                self.classification_cache.put(cache_key, {"category": category})
+            return category
                 
         except Exception as e:
-            print(f"⚠️ Orchestrator classification error: {e}")
+            logger.warning("⚠️ Orchestrator classification error: %s", e)
             return "complex"
 
     def get_agent_context(self, session_id: str) -> str:
@@ -159,14 +268,14 @@ class OrchestratorService:
             return
 
         session = self.session_manager.get_session(session_id)
-        messages = session.get("messages", [])
         
         # Summarize if we have at least 3 messages and no summary, or every 5 messages
-        if len(messages) >= 3:
+        if len(session["messages"]) >= 3:
             try:
                 # Get last 10 messages for better summary context
-                new_summary = await self.llm_service.generate_summary(session.get("summary", ""), messages[-10:])
+                messages = self.session_manager.get_history_slice(session_id, 10)
+                new_summary = await self.llm_service.generate_summary(session.get("summary", ""), messages)
                 self.session_manager.update_summary(session_id, new_summary)
-                print(f"✨ [Orchestrator] Updated summary for {session_id}: {new_summary}")
+                logger.debug("✨ [Orchestrator] Updated summary for %s: %s", session_id, new_summary)
             except Exception as e:
-                print(f"⚠️ Summary update task failed: {e}")
+                logger.warning("⚠️ Summary update task failed: %s", e)
@@ -5,9 +5,71 @@ import psycopg2
 import os
 import uuid
 import math
+import logging
 from typing import Dict, Any, List, Optional
 from services.neon_vector_store import _get_conn
 
+logger = logging.getLogger("rag.orders")
+
+# Unambiguous cart/checkout phrasing, routed here without an LLM
+# classification call. Deliberately narrow: anything that might be a menu
+# question ("what can I order?") is left to the classifier.
+_ORDER_INTENT_RE = re.compile(
+    r"\b(?:"
+    r"i(?:'d| would) like to order|i want to order|i'll order|order me|"
+    r"place (?:an |my |the )?order|confirm (?:my |the )?order|"
+    r"add (?:it|this|that|them|one|two|\d+) (?:to|in) (?:my |the )?(?:cart|order)|"
+    r"(?:show|view|check|clear|empty) (?:my |the )?cart(?=\W*(?:please|pls|plz)?\W*$)|"
+    r"order (?:kar|karo|kar do|krdo|kardo)|cart (?:mein|main) (?:daal|dal|add)"
+    r")\b",
+    re.IGNORECASE
+)
+# Messages the phrasing above can appear in that are still not orders:
+# questions about ordering, and switching to another restaurant (which the
+# classifier prompt routes to COMPLEX)
+_NOT_ORDER_INTENT_RE = re.compile(
+    r"\?\W*$|"
+    r"^\W*(?:how|what|where|when|why|which|can|could|do|does|is|are|should|kaise|kya|kab|kahan)\b|"
+    r"\b(?:another|different|other|koi aur|kisi aur|dusr[ae]|doosr[ae])\s+restaurants?\b",
+    re.IGNORECASE
+)
+
+
+def is_order_intent(query: str) -> bool:
+    """True if the query is an explicit ordering or cart request"""
+    return _ORDER_INTENT_RE.search(query) is not None and _NOT_ORDER_INTENT_RE.search(query) is None
+
+_EXTRACTION_PROMPT = """You are a specialized order extractor. Always output valid JSON.
+Extract the user's intent and order details for the CURRENT RESTAURANT.
+
+JSON FORMAT: {"intent": str, "items": list, "remove_items": list, "phone": str, "address": str, "suggestion": str, "error": str}
+
+VALID INTENTS:
+- "add_item": user only wants to add items
+- "remove_item": user only wants to remove items
+- "modify_cart": user wants to BOTH remove AND add items in the same message
+- "update_item": change quantity of existing item
+- "view_cart": show what's in cart
+- "clear_cart": empty the entire cart
+- "confirm_order": finalize and place order
+- "set_info": provide phone/address
+- "question": pure information question, NO cart changes
+
+REMOVE KEYWORDS (Urdu/English) — if ANY of these appear, set remove_items and use remove_item or modify_cart intent:
+ہٹا دو, ہٹاؤ, اٹھاؤ, نکالو, نکال دو, ریموف, ہٹا, ہٹا دیو, remove, nikal do, hata do, hatao, uthao, nikalo, drop, cancel item
+
+STRICT RULES:
+1. "add_item" / "modify_cart" items list: ONLY items in MENU CONTEXT with a valid Item ID (UUID). Each must have: name, quantity, price, item_id.
+2. "remove_item" / "modify_cart" remove_items list: item names or IDs from CURRENT CART the user wants removed. Use the EXACT name from CURRENT CART.
+3. CRITICAL: If the user's message contains ANY remove keyword (see above) AND there are items in CURRENT CART, you MUST populate "remove_items" with the matching cart item name(s) and set intent to "remove_item" or "modify_cart". NEVER return intent="question" when user is asking to remove something.
+4. If user wants to remove AND add in the same message → intent="modify_cart", populate both "remove_items" and "items".
+5. "confirm_order": If phone/address are already in EXISTING_USER_INFO, DO NOT ask for them again.
+6. HISTORY PERSISTENCE: If an item was removed in recent history, do NOT add it back in "items" unless user explicitly re-adds it.
+7. If user says "yes", "han", "kar do" following a suggestion, add that suggested item.
+8. "question" intent means ZERO cart changes — only use it for pure info questions with no add/remove intent.
+"""
+
+
 class OrderHandler:
     def __init__(self, llm_service, rag_system):
         self.llm_service = llm_service
@@ -73,12 +135,12 @@ class OrderHandler:
                                     user_info["address"] = str(addr_obj)
                             
                             if user_info["phone"] or user_info["address"]:
-                                print(f"✅ [OrderHandler] Pre-loaded user info for {user_id} — phone={'YES' if user_info['phone'] else 'NO'}")
+                                logger.info("✅ [OrderHandler] Pre-loaded user info for %s — phone=%s", user_id, 'YES' if user_info['phone'] else 'NO')
                 conn.close()
             else:
-                print(f"ℹ️ [OrderHandler] ID '{user_id[:15]}...' is not a UUID — skipping DB lookup")
+                logger.debug("ℹ️ [OrderHandler] ID '%s...' is not a UUID — skipping DB lookup", user_id[:15])
         except Exception as e:
-            print(f"⚠️ Error fetching user info for {user_id}: {e}")
+            logger.warning("⚠️ Error fetching user info for %s: %s", user_id, e)
         return user_info
 
     async def _lookup_user_id_by_phone(self, phone: str) -> Optional[str]:
@@ -103,7 +165,7 @@ class OrderHandler:
                             return str(row[0])
             conn.close()
         except Exception as e:
-            print(f"⚠️ Error looking up user by phone: {e}")
+            logger.warning("⚠️ Error looking up user by phone: %s", e)
         return None
 
     async def _check_restaurant_availability(self, restaurant_id: str, user_lat: Optional[float], user_lng: Optional[float]) -> Dict[str, Any]:
@@ -128,10 +190,11 @@ class OrderHandler:
                 return {"available": True, "location_id": best_loc}
             return {"available": False}
         except Exception as e:
-            print(f"⚠️ Radius check failed: {e}")
+            logger.warning("⚠️ Radius check failed: %s", e)
             return {"available": True, "location_id": None}
 
-    async def handle(self, query: str, history: list = None, summary: str = "", session_id: str = "default", user_id: str = None) -> Dict[str, Any]:
+    async def handle(self, query: str, history: list = None, summary: str = "", session_id: str = "default", user_id: str = None,
+                     on_delta=None) -> Dict[str, Any]:
         # 0. Initialize or Update Context
         if session_id not in self.order_context:
             uid_to_lookup = user_id or session_id
@@ -147,7 +210,7 @@ class OrderHandler:
             # Update user_id if provided mid-session and re-fetch profile if unknown
             ctx = self.order_context[session_id]
             if user_id and ctx.get("user_id") != user_id:
-                print(f"👤 [OrderHandler] Updating user_id for session {session_id}: {user_id}")
+                logger.info("👤 [OrderHandler] Updating user_id for session %s: %s", session_id, user_id)
                 ctx["user_id"] = user_id
                 # Re-fetch profile info for the new user_id if phone/address are missing
                 if not ctx.get("phone") or not ctx.get("address"):
@@ -179,14 +242,14 @@ class OrderHandler:
                     hist_res = self.rag_system.detect_restaurants_in_query(msg['content'])
                     if hist_res and hist_res[0].get('detection_type') in ['explicit', 'explicit_and_category']:
                         detected_res = hist_res
-                        print(f"📜 [OrderHandler] Using restaurant from recent history: {hist_res[0]['name']}")
+                        logger.info("📜 [OrderHandler] Using restaurant from recent history: %s", hist_res[0]['name'])
                         break
         
         # Fallback to summary only if no history hit
         if not detected_res and summary and not is_switch:
             detected_res = self.rag_system.detect_restaurants_in_query(summary)
             if detected_res:
-                print(f"📋 [OrderHandler] Using restaurant from summary: {detected_res[0]['name']}")
+                logger.info("📋 [OrderHandler] Using restaurant from summary: %s", detected_res[0]['name'])
             
         if detected_res:
             new_rid = detected_res[0]["id"]
@@ -200,7 +263,7 @@ class OrderHandler:
                 # Only switch if the query explicitly names a new restaurant (explicit detection)
                 if detected_res[0].get("detection_type") in ["explicit", "explicit_and_category"]:
                     if ctx["items"]:
-                        print(f"🔄 Restaurant switch: {ctx['restaurant_name']} -> {new_name}. Clearing cart.")
+                        logger.info("🔄 Restaurant switch: %s -> %s. Clearing cart.", ctx['restaurant_name'], new_name)
                         ctx["items"] = []  # Clear the old cart
                     ctx["restaurant_id"] = new_rid
                     ctx["restaurant_name"] = new_name
@@ -215,7 +278,7 @@ class OrderHandler:
                 if rinfo.get("data", {}).get("chunks"):
                     ctx["restaurant_id"] = rid
                     ctx["restaurant_name"] = rinfo["name"]
-                    print(f"🏠 [OrderHandler] Inferred restaurant: {ctx['restaurant_name']} ({rid})")
+                    logger.info("🏠 [OrderHandler] Inferred restaurant: %s (%s)", ctx['restaurant_name'], rid)
                     break
 
         menu_context = self.rag_system.build_comprehensive_context(rag_info)
@@ -225,10 +288,9 @@ class OrderHandler:
         if history:
             history_msgs = "\n".join([f"{m['role']}: {m['content']}" for m in history[-5:]])
 
-        extraction_prompt = f"""You are an order extractor for {ctx['restaurant_name']}.
-        Extract the user's intent and order details.
-        
-        CURRENT RESTAURANT: {ctx['restaurant_name']}
+        # Static extraction rules live in the system message so every turn
+        # shares a cacheable prompt prefix; only per-turn state follows
+        extraction_prompt = f"""CURRENT RESTAURANT: {ctx['restaurant_name']}
         CURRENT CART: {json.dumps(ctx['items'])}
         
         MENU CONTEXT FOR {ctx['restaurant_name']} (ONLY ADD ITEMS FROM HERE):
@@ -243,36 +305,10 @@ class OrderHandler:
         
         SUMMARY: {summary}
         USER QUERY: "{query}"
-        
-        JSON FORMAT: {{"intent": str, "items": list, "remove_items": list, "phone": str, "address": str, "suggestion": str, "error": str}}
-        
-        VALID INTENTS:
-        - "add_item": user only wants to add items
-        - "remove_item": user only wants to remove items
-        - "modify_cart": user wants to BOTH remove AND add items in the same message
-        - "update_item": change quantity of existing item
-        - "view_cart": show what's in cart
-        - "clear_cart": empty the entire cart
-        - "confirm_order": finalize and place order
-        - "set_info": provide phone/address
-        - "question": pure information question, NO cart changes
-        
-        REMOVE KEYWORDS (Urdu/English) — if ANY of these appear, set remove_items and use remove_item or modify_cart intent:
-        ہٹا دو, ہٹاؤ, اٹھاؤ, نکالو, نکال دو, ریموف, ہٹا, ہٹا دیو, remove, nikal do, hata do, hatao, uthao, nikalo, drop, cancel item
-        
-        STRICT RULES:
-        1. "add_item" / "modify_cart" items list: ONLY items in MENU CONTEXT with a valid Item ID (UUID). Each must have: name, quantity, price, item_id.
-        2. "remove_item" / "modify_cart" remove_items list: item names or IDs from CURRENT CART the user wants removed. Use the EXACT name from CURRENT CART.
-        3. CRITICAL: If the user's message contains ANY remove keyword (see above) AND there are items in CURRENT CART, you MUST populate "remove_items" with the matching cart item name(s) and set intent to "remove_item" or "modify_cart". NEVER return intent="question" when user is asking to remove something.
-        4. If user wants to remove AND add in the same message → intent="modify_cart", populate both "remove_items" and "items".
-        5. "confirm_order": If phone/address are already in EXISTING_USER_INFO, DO NOT ask for them again.
-        6. HISTORY PERSISTENCE: If an item was removed in recent history, do NOT add it back in "items" unless user explicitly re-adds it.
-        7. If user says "yes", "han", "kar do" following a suggestion, add that suggested item.
-        8. "question" intent means ZERO cart changes — only use it for pure info questions with no add/remove intent.
         """
         
         messages = [
-            {"role": "system", "content": "You are a specialized order extractor. Always output valid JSON."},
+            {"role": "system", "content": _EXTRACTION_PROMPT},
             {"role": "user", "content": extraction_prompt}
         ]
         
@@ -285,7 +321,7 @@ class OrderHandler:
             if not ctx.get("user_id"):
                 ctx["user_id"] = await self._lookup_user_id_by_phone(ctx["phone"])
                 if ctx["user_id"]:
-                    print(f"👤 [OrderHandler] Linked session to user_id: {ctx['user_id']} via phone")
+                    logger.info("👤 [OrderHandler] Linked session to user_id: %s via phone", ctx['user_id'])
 
         if extraction.get("address"): ctx["address"] = extraction["address"]
         
@@ -321,7 +357,7 @@ class OrderHandler:
                 else:
                     removed_names.append(item["name"])
             ctx["items"] = new_cart
-            print(f"🗑️ [OrderHandler] Removed from cart: {removed_names}")
+            logger.info("🗑️ [OrderHandler] Removed from cart: %s", removed_names)
 
         # STEP B: Process additions (only for intents that add items)
         if intent in ("add_item", "modify_cart", "update_item"):
@@ -345,7 +381,7 @@ class OrderHandler:
                                 "item_id": item_id
                             })
                             added_names.append(item.get("name", "Item"))
-            print(f"🛒 [OrderHandler] Added to cart: {added_names}")
+            logger.info("🛒 [OrderHandler] Added to cart: %s", added_names)
 
         # STEP C: Build response based on what actually happened
         if removed_names or added_names:
@@ -400,7 +436,7 @@ class OrderHandler:
                         
                         if await self._save_order_to_db(ctx, session_id):
                             res_en = f"Success! Your order from {ctx['restaurant_name']} has been placed. It will be delivered to {ctx['address']}."
-                            print(f"📦 [OrderHandler] Order SUCCESS for {ctx.get('user_id')}")
+                            logger.info("📦 [OrderHandler] Order SUCCESS for %s", ctx.get('user_id'))
                             self.order_context[session_id].update({
                                 "items": [], "confirmed": True,
                                 "restaurant_id": None, "confirmation_details_shown": False
@@ -417,7 +453,8 @@ class OrderHandler:
             dual = await self.llm_service.generate_dual_response(
                 user_message=query,
                 context=f"Restaurant: {ctx['restaurant_name']}. Cart: {json.dumps(ctx['items'])}. Menu: {menu_context}\n\nINSTRUCTION: You are a VOICE ORDERING AGENT. Help the customer. You CAN add or remove items — just ask what they want.",
-                conversation_history=history
+                conversation_history=history,
+                on_delta=on_delta
             )
             return {
                 "response": dual['en'], "response_en": dual['en'], "response_ur": dual['ur'],
@@ -428,7 +465,8 @@ class OrderHandler:
         dual = await self.llm_service.generate_dual_response(
             user_message=f"System Action: {intent}. Summary: {res_en}",
             context=f"Restaurant: {ctx['restaurant_name']}. Cart: {json.dumps(ctx['items'])}. Menu: {menu_context}",
-            conversation_history=history
+            conversation_history=history,
+            on_delta=on_delta
         )
         
         return {
@@ -451,7 +489,7 @@ class OrderHandler:
                         elif ctx.get("phone"):
                             user_id = await self._lookup_user_id_by_phone(ctx["phone"])
                     
-                    print(f"📝 [OrderHandler] Saving order to DB. UserID={user_id}, RestaurantID={ctx.get('restaurant_id')}, Items={len(ctx.get('items', []))}")
+                    logger.info("📝 [OrderHandler] Saving order to DB. UserID=%s, RestaurantID=%s, Items=%s", user_id, ctx.get('restaurant_id'), len(ctx.get('items', [])))
                     subtotal = sum(float(i.get('price', 0)) * int(i.get('quantity', 1)) for i in ctx["items"])
                     tax_amount = round(subtotal * 0.15, 2)
                     delivery_fee = 100.0
@@ -475,7 +513,7 @@ class OrderHandler:
                             row = cur.fetchone()
                         loc_id = row[0] if row else None
                     if not loc_id:
-                        print(f"❌ No location found for restaurant {ctx['restaurant_id']}")
+                        logger.error("❌ No location found for restaurant %s", ctx['restaurant_id'])
                         return False
 
                     # Build items JSON for the orders.items column
@@ -530,12 +568,11 @@ class OrderHandler:
                                 ) VALUES (%s, %s, %s, %s, %s, %s, '{}', NULL, NOW(), NOW())
                             """, (order_item_id, order_id, item_id, qty, unit_price, unit_price * qty))
 
-                    print(f"✅ Order {order_id} saved — user={user_id} restaurant={ctx['restaurant_name']} total=PKR{total_amount}")
+                    logger.info("✅ Order %s saved — user=%s restaurant=%s total=PKR%s", order_id, user_id, ctx['restaurant_name'], total_amount)
                     ctx["last_order_id"] = order_id
                     return True
         except Exception as e:
-            print(f"❌ DB Error saving order: {e}")
-            import traceback; traceback.print_exc()
+            logger.exception("❌ DB Error saving order: %s", e)
             return False
 
     def _cart_to_string(self, items: List[dict]) -> str:
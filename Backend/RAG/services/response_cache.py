@@ -0,0 +1,72 @@
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase and collapse whitespace so trivially different repeats share a key"""
+    return _WHITESPACE_RE.sub(' ', message.strip().lower())
+
+
+class QueryCache:
+    """Thread-safe LRU + TTL cache of final chat responses"""
+
+    def __init__(self, max_size: int = 2000, ttl_seconds: int = 300):
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored_at, response)
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def make_key(self, *parts: str) -> str:
+        """sha1 over the normalized key parts"""
+        raw = "\x00".join(normalize_message(p or "") for p in parts)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response, or None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, response = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(response)
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """Store a response, evicting the least recently used entry when full"""
+        with self.lock:
+            self.entries[key] = (time.time(), dict(response))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,106 @@
+import time
+import threading
+from typing import Dict, Optional, Any
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Embedding-similarity cache of final chat responses.
+
+    Cached query embeddings live in one preallocated float32 matrix so a
+    lookup is a single matmul against every key; responses, scopes and
+    timestamps are kept in arrays parallel to its rows.
+    """
+
+    def __init__(self, dim: int = 384, threshold: float = 0.92, max_size: int = 10000,
+                 ttl_seconds: int = 300, initial_capacity: int = 256):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        capacity = min(initial_capacity, max_size)
+        self.keys = np.zeros((capacity, dim), dtype=np.float32)
+        self.scope_ids = np.full(capacity, -1, dtype=np.int64)
+        self.stored_at = np.zeros(capacity, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.responses: list = [None] * capacity
+        self.size = 0
+        self.clock = 0
+        self.scopes: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def _grow(self):
+        """Double the row capacity (up to max_size), amortizing appends"""
+        capacity = min(len(self.keys) * 2, self.max_size)
+        keys = np.zeros((capacity, self.keys.shape[1]), dtype=np.float32)
+        keys[:self.size] = self.keys[:self.size]
+        self.keys = keys
+        self.scope_ids = np.concatenate([self.scope_ids, np.full(capacity - len(self.scope_ids), -1, dtype=np.int64)])
+        self.stored_at = np.concatenate([self.stored_at, np.zeros(capacity - len(self.stored_at))])
+        self.last_used = np.concatenate([self.last_used, np.zeros(capacity - len(self.last_used), dtype=np.int64)])
+        self.responses.extend([None] * (capacity - len(self.responses)))
+
+    def get(self, scope: str, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return a copy of the closest cached response in scope, if similar enough"""
+        with self.lock:
+            scope_id = self.scopes.get(scope)
+            if scope_id is None or self.size == 0:
+                self.misses += 1
+                return None
+            n = self.size
+            # Keys and queries are unit-normalized, so the dot product is cosine
+            scores = self.keys[:n] @ embedding
+            stale = (self.scope_ids[:n] != scope_id) | (time.time() - self.stored_at[:n] > self.ttl_seconds)
+            scores[stale] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.clock += 1
+            self.last_used[best] = self.clock
+            self.hits += 1
+            return dict(self.responses[best])
+
+    def put(self, scope: str, embedding: np.ndarray, response: Dict[str, Any]):
+        """Store a response, evicting the least recently used row when full"""
+        with self.lock:
+            if self.size < len(self.keys):
+                row = self.size
+                self.size += 1
+            elif len(self.keys) < self.max_size:
+                self._grow()
+                row = self.size
+                self.size += 1
+            else:
+                row = int(np.argmin(self.last_used[:self.size]))
+
+            self.clock += 1
+            self.keys[row] = embedding
+            self.scope_ids[row] = self.scopes.setdefault(scope, len(self.scopes))
+            self.stored_at[row] = time.time()
+            self.last_used[row] = self.clock
+            self.responses[row] = dict(response)
+
+    def clear(self):
+        """Drop every entry (counters and capacity are kept)"""
+        with self.lock:
+            self.size = 0
+            self.responses = [None] * len(self.responses)
+            self.scopes.clear()
+            self.scope_ids.fill(-1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self.size,
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -1,7 +1,12 @@
 import time
+from collections import deque
+from itertools import islice
 from typing import List, Dict, Optional
 import threading
 
+# Raw history kept per session; older turns live on in the rolling summary
+_MAX_HISTORY = 20
+
 class SessionManager:
     def __init__(self, ttl_seconds: int = 3600):
         self.sessions: Dict[str, Dict] = {}
@@ -13,7 +18,7 @@ class SessionManager:
         with self.lock:
             if session_id not in self.sessions:
                 self.sessions[session_id] = {
-                    "messages": [],
+                    "messages": deque(maxlen=_MAX_HISTORY),
                     "summary": "",
                     "last_active": time.time(),
                     "metadata": {}
@@ -27,10 +32,8 @@ class SessionManager:
         """Add a message to the session history"""
         with self.lock:
             session = self.get_session(session_id)
+            # Bounded deque drops the oldest message instead of re-slicing the list
             session["messages"].append({"role": role, "content": content})
-            # Keep raw history manageable (e.g., last 20 messages for safety)
-            if len(session["messages"]) > 20:
-                session["messages"] = session["messages"][-20:]
 
     def update_summary(self, session_id: str, summary: str):
         """Update the rolling summary for the session"""
@@ -40,8 +43,9 @@ class SessionManager:
 
     def get_history_slice(self, session_id: str, count: int = 5) -> List[Dict]:
         """Get the last N messages for immediate context"""
-        session = self.get_session(session_id)
-        return session["messages"][-count:]
+        with self.lock:
+            messages = self.get_session(session_id)["messages"]
+            return list(islice(messages, max(len(messages) - count, 0), None))
 
     def get_context_for_agent(self, session_id: str) -> Dict:
         """Package history and summary for agent consumption"""
@@ -5,15 +5,32 @@ Setup script for Cheezious RAG Voice Assistant
 
 import os
 import sys
+import shutil
+import argparse
 import subprocess
 import json
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 def install_dependencies():
     """Install Python dependencies"""
     print("📦 Installing Python dependencies...")
+    # A fully pinned lock file needs no dependency resolution
+    lock_file = Path("requirements.lock")
+    requirements = str(lock_file) if lock_file.exists() else "requirements.txt"
+    
+    # uv's resolver/installer is much faster than pip's when it is available
+    if shutil.which("uv"):
+        cmd = ["uv", "pip", "install", "--python", sys.executable]
+    else:
+        cmd = [sys.executable, "-m", "pip", "install", "--prefer-binary",
+               "--cache-dir", str(Path.home() / ".cache" / "pip")]
+    cmd += ["-r", requirements]
+    if lock_file.exists():
+        cmd.append("--no-deps")
+    
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+        subprocess.check_call(cmd)
         print("✅ Dependencies installed successfully!")
     except subprocess.CalledProcessError as e:
         print(f"❌ Error installing dependencies: {e}")
@@ -22,24 +39,22 @@ def install_dependencies():
 
 def create_env_file():
     """Create .env file from template"""
-    env_file = Path(".env")
-    env_example = Path("env.example")
+    env_file = ".env"
+    env_example = "env.example"
+    # Stat .env once; the elif below reuses the result
+    env_exists = os.path.exists(env_file)
     
-    if not env_file.exists() and env_example.exists():
+    if not env_exists and os.path.exists(env_example):
         print("🔧 Creating .env file from template...")
         try:
-            with open(env_example, 'r') as f:
-                content = f.read()
-            
-            with open(env_file, 'w') as f:
-                f.write(content)
+            shutil.copyfile(env_example, env_file)
             
             print("✅ .env file created! Please update it with your OpenRouter API key.")
             print("📝 Edit .env file and set OPENROUTER_API_KEY=your_actual_api_key")
         except Exception as e:
             print(f"❌ Error creating .env file: {e}")
             return False
-    elif env_file.exists():
+    elif env_exists:
         print("✅ .env file already exists")
     else:
         print("⚠️  No env.example file found")
@@ -50,25 +65,25 @@ def check_data_files():
     """Check if required data files exist"""
     print("📁 Checking data files...")
     
-    data_file = Path("data/cheezious_data.json")
-    if not data_file.exists():
+    if not os.path.exists("data/cheezious_data.json"):
         print("❌ data/cheezious_data.json not found!")
         return False
     
     print("✅ Data files found")
     return True
 
-def test_rag_system():
-    """Test the RAG system initialization"""
+def test_rag_system(smoke: bool = False):
+    """Test the RAG system initialization; smoke also runs a search"""
     print("🧪 Testing RAG system...")
     try:
         from utils.rag_system import CheeziousRAGSystem
         rag = CheeziousRAGSystem()
         print("✅ RAG system initialized successfully!")
         
-        # Test search functionality
-        results = rag.search_menu("pizza", top_k=3)
-        print(f"✅ Search test successful - found {len(results)} results")
+        # Searching loads the embedding model, so only do it when asked
+        if smoke:
+            results = rag.search_menu("pizza", top_k=3)
+            print(f"✅ Search test successful - found {len(results)} results")
         
         return True
     except Exception as e:
@@ -97,13 +112,29 @@ def create_directories():
         "logs"
     ]
     
+    # Optimistic mkdir: existing directories cost one failed syscall, not a stat too
     for directory in directories:
-        Path(directory).mkdir(exist_ok=True)
+        try:
+            os.mkdir(directory)
+        except FileExistsError:
+            pass
     
     print("✅ Directories created")
 
-def main():
+def parse_args(argv=None):
+    """Command-line flags for skipping the slow import/model checks"""
+    parser = argparse.ArgumentParser(description="Set up the Cheezious RAG Voice Assistant")
+    parser.add_argument("--skip-rag-test", action="store_true",
+                        help="don't import the RAG system (avoids loading torch / sentence-transformers)")
+    parser.add_argument("--skip-llm-test", action="store_true",
+                        help="don't import the LLM service")
+    parser.add_argument("--smoke", action="store_true",
+                        help="also run a search against the RAG system (loads the embedding model)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main setup function"""
+    args = parse_args(argv)
     print("🚀 Setting up Cheezious RAG Voice Assistant...")
     print("=" * 50)
     
@@ -125,15 +156,18 @@ def main():
         print("❌ Setup failed: Could not create .env file")
         return False
     
-    # Test RAG system
-    if not test_rag_system():
-        print("❌ Setup failed: RAG system test failed")
-        return False
-    
-    # Test LLM service
-    if not test_llm_service():
-        print("❌ Setup failed: LLM service test failed")
-        return False
+    # The RAG and LLM checks are independent, so run them side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        rag_ok = executor.submit(test_rag_system, smoke=args.smoke) if not args.skip_rag_test else None
+        llm_ok = executor.submit(test_llm_service) if not args.skip_llm_test else None
+        
+        if rag_ok and not rag_ok.result():
+            print("❌ Setup failed: RAG system test failed")
+            return False
+        
+        if llm_ok and not llm_ok.result():
+            print("❌ Setup failed: LLM service test failed")
+            return False
     
     print("=" * 50)
     print("🎉 Setup completed successfully!")
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+from services.embedding_model import embedding_namespace
+
+
+def unit_vectors(n, dim=384, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_round_trip_within_quantization_error(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), namespace="m|torch|")
+    texts = ["Zinger burger Rs. 500", "Family deal", "Opening hours"]
+    vectors = unit_vectors(len(texts))
+    keys = [cache.key(t) for t in texts]
+    cache.put_many(dict(zip(keys, vectors)))
+
+    found = cache.get_many(keys)
+    assert set(found) == set(keys)
+    for key, vector in zip(keys, vectors):
+        assert float(found[key] @ vector) > 0.99
+
+
+def test_missing_and_duplicate_keys(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), namespace="m|torch|")
+    stored = cache.key("stored")
+    cache.put_many({stored: unit_vectors(1)[0]})
+    found = cache.get_many([stored, cache.key("never stored"), stored])
+    assert list(found) == [stored]
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = EmbeddingCache(path, namespace="m|torch|")
+    key = first.key("chunk")
+    first.put_many({key: unit_vectors(1)[0]})
+    assert key in EmbeddingCache(path, namespace="m|torch|").get_many([key])
+
+
+def test_namespaces_do_not_share_vectors(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    torch_cache = EmbeddingCache(path, namespace="m|torch|")
+    onnx_cache = EmbeddingCache(path, namespace="m|onnx|onnx/model_qint8.onnx")
+    torch_cache.put_many({torch_cache.key("chunk"): unit_vectors(1)[0]})
+
+    assert torch_cache.key("chunk") != onnx_cache.key("chunk")
+    assert onnx_cache.get_many([onnx_cache.key("chunk")]) == {}
+
+
+def test_namespace_follows_loaded_backend_and_file(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_MODEL_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+    onnx = embedding_namespace(SimpleNamespace(backend="onnx"))
+    openvino = embedding_namespace(SimpleNamespace(backend="openvino"))
+    # A model that fell back to torch (or predates the backend attribute)
+    # ignores the exported graph file
+    torch = embedding_namespace(SimpleNamespace(backend="torch"))
+    assert embedding_namespace(SimpleNamespace()) == torch
+    assert len({onnx, openvino, torch}) == 3
+
+    monkeypatch.setenv("EMBEDDING_MODEL_FILE", "onnx/model.onnx")
+    assert embedding_namespace(SimpleNamespace(backend="onnx")) != onnx
+    assert embedding_namespace(SimpleNamespace(backend="torch")) == torch
@@ -0,0 +1,114 @@
+import numpy as np
+
+from services import response_cache, semantic_cache
+from services.response_cache import QueryCache
+from services.semantic_cache import SemanticCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def unit(*values, dim=8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector / np.linalg.norm(vector)
+
+
+def test_query_cache_key_normalizes_case_and_whitespace():
+    cache = QueryCache()
+    assert cache.make_key("  Show  KFC deals ", "kfc") == cache.make_key("show kfc deals", "KFC")
+    assert cache.make_key("show kfc deals", "kfc") != cache.make_key("show kfc deals", "cheezious")
+
+
+def test_query_cache_expires_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    cache = QueryCache(ttl_seconds=300)
+    cache.put("k", {"response": "hi"})
+
+    clock.now += 300
+    assert cache.get("k") == {"response": "hi"}
+    clock.now += 1
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = QueryCache(max_size=2)
+    cache.put("a", {"response": "a"})
+    cache.put("b", {"response": "b"})
+    assert cache.get("a") is not None  # "b" is now the oldest
+    cache.put("c", {"response": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"response": "a"}
+    assert cache.get("c") == {"response": "c"}
+
+
+def test_query_cache_returns_copies_and_clears():
+    cache = QueryCache()
+    cache.put("k", {"response": "hi"})
+    cache.get("k")["response"] = "changed"
+    assert cache.get("k") == {"response": "hi"}
+
+    cache.clear()
+    assert cache.get("k") is None
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (0, 2, 1)
+
+
+def test_semantic_cache_threshold():
+    cache = SemanticCache(dim=8, threshold=0.9)
+    cache.put("kfc", unit(1.0), {"response": "deals"})
+
+    assert cache.get("kfc", unit(1.0, 0.3)) == {"response": "deals"}  # cosine ~0.96
+    assert cache.get("kfc", unit(1.0, 0.6)) is None  # cosine ~0.86
+
+
+def test_semantic_cache_scope_isolation():
+    cache = SemanticCache(dim=8)
+    cache.put("kfc", unit(1.0), {"response": "kfc"})
+    cache.put("cheezious", unit(1.0), {"response": "cheezious"})
+
+    assert cache.get("kfc", unit(1.0)) == {"response": "kfc"}
+    assert cache.get("cheezious", unit(1.0)) == {"response": "cheezious"}
+    assert cache.get("pizza_hut", unit(1.0)) is None
+
+
+def test_semantic_cache_expires_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(semantic_cache.time, "time", clock)
+    cache = SemanticCache(dim=8, ttl_seconds=300)
+    cache.put("kfc", unit(1.0), {"response": "deals"})
+
+    clock.now += 301
+    assert cache.get("kfc", unit(1.0)) is None
+
+
+def test_semantic_cache_grows_then_evicts_least_recently_used():
+    cache = SemanticCache(dim=8, max_size=3, initial_capacity=1)
+    for i in range(3):
+        cache.put("kfc", unit(*([0.0] * i + [1.0])), {"response": i})
+    assert cache.get("kfc", unit(1.0)) == {"response": 0}  # row 1 is now the oldest
+    cache.put("kfc", unit(0.0, 0.0, 0.0, 1.0), {"response": 3})
+
+    assert cache.stats()["size"] == 3
+    assert cache.get("kfc", unit(0.0, 1.0)) is None
+    assert cache.get("kfc", unit(1.0)) == {"response": 0}
+    assert cache.get("kfc", unit(0.0, 0.0, 0.0, 1.0)) == {"response": 3}
+
+
+def test_semantic_cache_clear():
+    cache = SemanticCache(dim=8)
+    cache.put("kfc", unit(1.0), {"response": "deals"})
+    cache.clear()
+
+    assert cache.get("kfc", unit(1.0)) is None
+    cache.put("cheezious", unit(1.0), {"response": "pizza"})
+    assert cache.get("kfc", unit(1.0)) is None
+    assert cache.get("cheezious", unit(1.0)) == {"response": "pizza"}
@@ -0,0 +1,67 @@
+import pytest
+
+from services.basic_handler import small_talk_kind
+from services.order_handler import is_order_intent
+
+
+@pytest.mark.parametrize("query", [
+    "I want to order 2 zinger burgers",
+    "i'd like to order a large pizza",
+    "place my order",
+    "Confirm the order",
+    "add two to my cart",
+    "show my cart",
+    "view the cart please",
+    "clear my cart",
+    "order kar do",
+    "cart mein daal do",
+])
+def test_order_intent(query):
+    assert is_order_intent(query)
+
+
+@pytest.mark.parametrize("query", [
+    # Switching restaurants is COMPLEX per the classifier prompt
+    "I want to order from a different restaurant",
+    "i want to order from another restaurant",
+    "koi aur restaurant se order",
+    "kisi aur restaurant se order kar do",
+    # Questions about ordering
+    "how do I place an order?",
+    "can I place an order for delivery",
+    "what happens when I confirm my order",
+    # Cart verbs without a bare cart object
+    "check the cart size",
+    "show my cart total and the delivery fee",
+    # Menu questions
+    "what can I order?",
+    "pizza prices",
+])
+def test_not_order_intent(query):
+    assert not is_order_intent(query)
+
+
+@pytest.mark.parametrize("query, kind", [
+    ("hi", "greet"),
+    ("Hello there!", "greet"),
+    ("assalam o alaikum", "greet"),
+    ("good morning", "greet"),
+    ("bye", "bye"),
+    ("Allah Hafiz", "bye"),
+    ("thank you so much", "thanks"),
+    ("shukriya bhai", "thanks"),
+])
+def test_small_talk(query, kind):
+    assert small_talk_kind(query) == kind
+
+
+@pytest.mark.parametrize("query", [
+    "hi, what pizzas do you have?",
+    "hello I want to order",
+    "thanks, add a burger",
+    "high protein options",
+    "goodbye deal price",
+    "",
+])
+def test_not_small_talk(query):
+    assert small_talk_kind(query) is None
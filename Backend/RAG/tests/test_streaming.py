@@ -0,0 +1,74 @@
+import json
+import random
+
+import pytest
+
+from services.llm_service import CleanTextStreamer, JsonFieldStreamer, OpenAILLMService
+
+clean_response = OpenAILLMService._clean_response.__get__(object.__new__(OpenAILLMService))
+
+
+def stream(streamer, chunks):
+    return "".join(streamer.feed(chunk) for chunk in chunks)
+
+
+def _ascii_json(value):
+    """JSON string literal with every non-ASCII character as a \\u escape"""
+    return json.dumps(value, ensure_ascii=True)
+
+
+def every_split(text):
+    """text cut into two chunks at every position"""
+    return [[text[:i], text[i:]] for i in range(len(text) + 1)]
+
+
+@pytest.mark.parametrize("value", [
+    "Plain answer with no escapes.",
+    'Quote " backslash \\ slash / tab \t newline \n done',
+    "Urdu آپ کا کھانا تیار ہے and emoji 🍕",
+])
+def test_json_field_decodes_across_any_split(value):
+    # \u escapes (and the emoji's surrogate pair) get cut at every offset too
+    raw = '{"en": %s, "ur": "x"}' % _ascii_json(value)
+    for chunks in every_split(raw):
+        assert stream(JsonFieldStreamer("en"), chunks) == value
+
+
+def test_json_field_one_character_at_a_time():
+    value = 'Rs. 500 "deal" \\ 🍕'
+    raw = '{"en": %s}' % _ascii_json(value)
+    assert stream(JsonFieldStreamer("en"), list(raw)) == value
+
+
+def test_json_field_stops_at_closing_quote():
+    streamer = JsonFieldStreamer("en")
+    assert stream(streamer, ['{"en": "hi", ', '"ur": "salam"}']) == "hi"
+    assert streamer.done
+    assert streamer.feed("more") == ""
+
+
+def test_json_field_waits_for_its_key():
+    streamer = JsonFieldStreamer("en")
+    assert streamer.feed('{"ur": "salam", ') == ""
+    assert streamer.feed('"en": "hello"}') == "hello"
+
+
+@pytest.mark.parametrize("text", [
+    "Sure! **Zinger** burger is  Rs. 500.\n\n## Deals\n*Family* deal available ",
+    "  leading space, **bold**, *italic* and a lone * star",
+    "a **b** **c** d",
+])
+def test_clean_stream_adds_up_to_cleaned_text(text):
+    rng = random.Random(7)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 8)))
+        chunks = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+        streamer = CleanTextStreamer(clean_response)
+        assert stream(streamer, chunks) + streamer.flush() == clean_response(text)
+
+
+def test_clean_stream_never_emits_markdown():
+    streamer = CleanTextStreamer(clean_response)
+    pieces = [streamer.feed(c) for c in "Try the **Zinger** now"] + [streamer.flush()]
+    assert "*" not in "".join(pieces)
+    assert "".join(pieces) == "Try the Zinger now"
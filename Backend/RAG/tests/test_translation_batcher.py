@@ -0,0 +1,60 @@
+import asyncio
+
+import orjson
+
+from services.llm_service import TranslationBatcher
+
+
+class FakeLLM:
+    """Answers batch calls with a canned payload and single calls with a tagged echo"""
+
+    def __init__(self, batch_reply):
+        self.batch_reply = batch_reply
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    async def _call_openai_async(self, messages, max_tokens=None, response_format=None):
+        if response_format is not None:
+            self.batch_calls += 1
+            return self.batch_reply
+        self.single_calls += 1
+        return "ur:" + messages[-1]["content"].rsplit(": ", 1)[1]
+
+
+def translate_all(batcher, texts):
+    async def run():
+        return await asyncio.gather(*(batcher.translate(t) for t in texts))
+    return asyncio.run(run())
+
+
+def test_batches_concurrent_requests_into_one_call():
+    llm = FakeLLM(orjson.dumps({"translations": ["ایک", "دو", "تین"]}).decode())
+    results = translate_all(TranslationBatcher(llm, max_delay_ms=50), ["one", "two", "three"])
+    assert results == ["ایک", "دو", "تین"]
+    assert (llm.batch_calls, llm.single_calls) == (1, 0)
+
+
+def test_mismatched_list_falls_back_per_item():
+    llm = FakeLLM(orjson.dumps({"translations": ["ایک", "دو"]}).decode())
+    results = translate_all(TranslationBatcher(llm, max_delay_ms=50), ["one", "two", "three"])
+    assert results == ["ur:one", "ur:two", "ur:three"]
+    assert llm.single_calls == 3
+
+
+def test_invalid_json_falls_back_per_item():
+    llm = FakeLLM("Sure! Here are the translations: ...")
+    results = translate_all(TranslationBatcher(llm, max_delay_ms=50), ["one", "two"])
+    assert results == ["ur:one", "ur:two"]
+    assert llm.single_calls == 2
+
+
+def test_non_object_payload_falls_back_per_item():
+    llm = FakeLLM(orjson.dumps(["ایک", "دو"]).decode())
+    results = translate_all(TranslationBatcher(llm, max_delay_ms=50), ["one", "two"])
+    assert results == ["ur:one", "ur:two"]
+
+
+def test_single_text_skips_the_batch_prompt():
+    llm = FakeLLM("unused")
+    assert translate_all(TranslationBatcher(llm), ["hello"]) == ["ur:hello"]
+    assert llm.batch_calls == 0
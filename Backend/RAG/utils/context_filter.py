@@ -5,65 +5,107 @@ Filters and extracts only the specific information needed to answer the query.
 """
 
 import re
+import functools
 from typing import List, Dict, Optional
 
+# Query intent bits, computed once per query by ContextFilter._analyze_query
+ASKING_PRICES = 1
+ASKING_DEALS = 2
+ASKING_MENU = 4
+ASKING_LOCATION = 8
+ASKING_HOURS = 16
+
+_PRICE_KEYWORDS = frozenset({'price', 'cost', 'how much', 'rs.', 'rupee', 'pkr'})
+_DEAL_KEYWORDS = frozenset({'deal', 'offer', 'combo', 'special', 'promotion', 'package'})
+_MENU_KEYWORDS = frozenset({'menu', 'item', 'option', 'food', 'dish', 'what do you have'})
+_LOCATION_KEYWORDS = frozenset({'location', 'where', 'branch', 'outlet', 'city'})
+_HOURS_KEYWORDS = frozenset({'hours', 'time', 'open', 'close', 'when'})
+
+
+def _keyword_re(keywords, flags=re.IGNORECASE) -> re.Pattern:
+    """Substring alternation matching any of the keywords, ignoring case by default"""
+    return re.compile('|'.join(re.escape(kw) for kw in sorted(keywords)), flags)
+
+
+# One case-insensitive alternation per category, so each query or line is
+# scanned once in C instead of once per keyword after .lower()
+_QUERY_PRICE_RE = _keyword_re(_PRICE_KEYWORDS)
+_QUERY_DEAL_RE = _keyword_re(_DEAL_KEYWORDS)
+_QUERY_MENU_RE = _keyword_re(_MENU_KEYWORDS)
+_QUERY_LOCATION_RE = _keyword_re(_LOCATION_KEYWORDS)
+_QUERY_HOURS_RE = _keyword_re(_HOURS_KEYWORDS)
+
+# Line-level checks used when extracting sections of a chunk. These run on
+# every line, so they are case-sensitive and applied to lowercased text:
+# case-folding matches are several times slower in the re engine
+_PRICE_RE = re.compile(r'rs\.?\s*\d+|' + _keyword_re({'rs.', 'rupee', 'price', 'cost'}).pattern)
+_DEAL_RE = _keyword_re(_DEAL_KEYWORDS, 0)
+_MENU_RE = _keyword_re({'pizza', 'burger', 'chicken', 'item', 'menu'}, 0)
+_LOCATION_RE = _keyword_re({'location', 'city', 'branch', 'address'}, 0)
+_HOURS_RE = _keyword_re({'hours', 'time', 'open', 'close', 'am', 'pm'}, 0)
+# Whole-chunk relevance check used by filter_chunks_by_query
+_CHUNK_PRICE_RE = _keyword_re({'rs.', 'rupee', 'price'})
+
+_LINE_RES = (
+    (ASKING_PRICES, _PRICE_RE),
+    (ASKING_DEALS, _DEAL_RE),
+    (ASKING_MENU, _MENU_RE),
+    (ASKING_LOCATION, _LOCATION_RE),
+    (ASKING_HOURS, _HOURS_RE),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _line_re(mask: int) -> Optional[re.Pattern]:
+    """Union of the line patterns for every category in mask, so each line
+    is scanned once however many categories the query asks about; matches
+    lowercased text"""
+    patterns = [pattern.pattern for bit, pattern in _LINE_RES if mask & bit]
+    if not patterns:
+        return None
+    return re.compile('|'.join(patterns))
+
+
+
+@functools.lru_cache(maxsize=4096)
+def _content_tokens(content: str) -> frozenset:
+    """Distinct lowercased words of a chunk; retrieval keeps returning the
+    same chunks, so each is tokenized once rather than on every query"""
+    return frozenset(content.lower().split())
+
 
 class ContextFilter:
     """Filters context to only include information directly relevant to the query"""
     
-    def __init__(self):
-        self.price_keywords = ['price', 'cost', 'how much', 'rs.', 'rupee', 'pkr']
-        self.deal_keywords = ['deal', 'offer', 'combo', 'special', 'promotion', 'package']
-        self.menu_keywords = ['menu', 'item', 'option', 'food', 'dish', 'what do you have']
-        self.location_keywords = ['location', 'where', 'branch', 'outlet', 'city']
-        self.hours_keywords = ['hours', 'time', 'open', 'close', 'when']
+    def _analyze_query(self, query: str) -> int:
+        """Bitmask of ASKING_* flags describing what the user is asking about"""
+        mask = 0
+        if _QUERY_PRICE_RE.search(query):
+            mask |= ASKING_PRICES
+        if _QUERY_DEAL_RE.search(query):
+            mask |= ASKING_DEALS
+        if _QUERY_MENU_RE.search(query):
+            mask |= ASKING_MENU
+        if _QUERY_LOCATION_RE.search(query):
+            mask |= ASKING_LOCATION
+        if _QUERY_HOURS_RE.search(query):
+            mask |= ASKING_HOURS
+        return mask
     
     def extract_relevant_sections(self, chunk_content: str, query: str) -> str:
         """Extract only the sections of a chunk that are relevant to the query"""
-        query_lower = query.lower()
-        lines = chunk_content.split('\n')
+        return self._extract_sections(chunk_content, self._analyze_query(query))
+    
+    def _extract_sections(self, chunk_content: str, mask: int) -> str:
+        """extract_relevant_sections with the query already reduced to its ASKING_* mask"""
+        # A line is relevant if it matches any category the query asks about
+        line_re = _line_re(mask)
         relevant_lines = []
-        
-        # Determine what the user is asking about
-        asking_about_prices = any(kw in query_lower for kw in self.price_keywords)
-        asking_about_deals = any(kw in query_lower for kw in self.deal_keywords)
-        asking_about_menu = any(kw in query_lower for kw in self.menu_keywords)
-        asking_about_location = any(kw in query_lower for kw in self.location_keywords)
-        asking_about_hours = any(kw in query_lower for kw in self.hours_keywords)
-        
-        # If asking about specific things, filter lines
-        for line in lines:
-            line_lower = line.lower()
-            
-            # If asking about prices, include lines with prices
-            if asking_about_prices:
-                if any(kw in line_lower for kw in ['rs.', 'rupee', 'price', 'cost']) or re.search(r'rs\.?\s*\d+', line, re.IGNORECASE):
-                    relevant_lines.append(line)
-                    continue
-            
-            # If asking about deals, include deal-related lines
-            if asking_about_deals:
-                if any(kw in line_lower for kw in self.deal_keywords):
-                    relevant_lines.append(line)
-                    continue
-            
-            # If asking about menu, include menu items
-            if asking_about_menu:
-                if any(kw in line_lower for kw in ['pizza', 'burger', 'chicken', 'item', 'menu']):
-                    relevant_lines.append(line)
-                    continue
-            
-            # If asking about location, include location info
-            if asking_about_location:
-                if any(kw in line_lower for kw in ['location', 'city', 'branch', 'address']):
-                    relevant_lines.append(line)
-                    continue
-            
-            # If asking about hours, include hours info
-            if asking_about_hours:
-                if any(kw in line_lower for kw in ['hours', 'time', 'open', 'close', 'am', 'pm']):
-                    relevant_lines.append(line)
-                    continue
+        if line_re is not None:
+            # Lowercasing never adds or drops a newline, so the lines pair up
+            lines = chunk_content.split('\n')
+            relevant_lines = [line for line, line_lower in zip(lines, chunk_content.lower().split('\n'))
+                              if line_re.search(line_lower)]
         
         # If we filtered and got results, return filtered
         if relevant_lines:
@@ -75,38 +117,27 @@ class ContextFilter:
     def filter_chunks_by_query(self, chunks: List[Dict], query: str) -> List[Dict]:
         """Filter chunks to only include those relevant to the query"""
         query_lower = query.lower()
+        mask = self._analyze_query(query)
+        query_words = frozenset(query_lower.split())
         filtered_chunks = []
         
         for chunk in chunks:
-            content = chunk.get('content', '').lower()
-            
-            # Check if chunk is relevant to query
-            is_relevant = False
-            
-            # Check for direct keyword matches
-            query_words = set(query_lower.split())
-            content_words = set(content.split())
-            common_words = query_words.intersection(content_words)
+            content = chunk.get('content', '')
             
-            # If significant overlap, it's relevant
-            if len(common_words) >= 2:
-                is_relevant = True
+            # Check for direct keyword matches: two distinct query words in
+            # the chunk is significant overlap
+            is_relevant = len(query_words & _content_tokens(content)) >= 2
             
             # Check for specific query types
-            if any(kw in query_lower for kw in self.price_keywords):
-                if any(kw in content for kw in ['rs.', 'rupee', 'price']):
-                    is_relevant = True
+            if not is_relevant and mask & ASKING_PRICES and _CHUNK_PRICE_RE.search(content):
+                is_relevant = True
             
-            if any(kw in query_lower for kw in self.deal_keywords):
-                if any(kw in content for kw in self.deal_keywords):
-                    is_relevant = True
+            if not is_relevant and mask & ASKING_DEALS and _QUERY_DEAL_RE.search(content):
+                is_relevant = True
             
             if is_relevant:
                 # Extract only relevant sections
-                filtered_content = self.extract_relevant_sections(chunk['content'], query)
-                chunk_copy = chunk.copy()
-                chunk_copy['content'] = filtered_content
-                filtered_chunks.append(chunk_copy)
+                filtered_chunks.append({**chunk, 'content': self._extract_sections(chunk['content'], mask)})
         
         return filtered_chunks if filtered_chunks else chunks[:1]  # Return at least one chunk
 
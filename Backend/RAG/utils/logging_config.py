@@ -0,0 +1,35 @@
+"""
+Queue-backed logging for the API server.
+
+Request-path modules log through children of the "rag" logger. Records are
+handed to a background listener thread, so a slow stdout never stalls the
+event loop, and messages below LOG_LEVEL are dropped before any formatting.
+"""
+
+import os
+import sys
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+_listener = None
+
+
+def setup_logging():
+    """Attach the queue handler to the "rag" logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    _listener = QueueListener(log_queue, stream)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger = logging.getLogger("rag")
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.addHandler(QueueHandler(log_queue))
+    logger.propagate = False
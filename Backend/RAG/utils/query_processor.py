@@ -5,6 +5,7 @@ This module provides industry-standard query preprocessing, expansion, and optim
 """
 
 import re
+import functools
 from typing import List, Dict, Set
 from collections import Counter
 
@@ -13,7 +14,7 @@ class QueryProcessor:
     """Production-grade query processor for RAG systems"""
     
     # Conversational filler words to remove
-    FILLER_WORDS = {
+    FILLER_WORDS = frozenset({
         'hi', 'hello', 'hey', 'please', 'thanks', 'thank you',
         'can you', 'could you', 'would you', 'will you',
         'tell me', 'let me know', 'i want', 'i need', 'i would like',
@@ -22,7 +23,10 @@ class QueryProcessor:
         # Roman Urdu/Hindi fillers
         'yaar', 'batao', 'dikhao', 'mujhe', 'bataen', 'dikhaen',
         'kya', 'hai', 'hain', 'mein', 'se', 'ka', 'ki', 'ke'
-    }
+    })
+    
+    _GREETING_WORDS = frozenset({'hi', 'hello', 'hey', 'please'})
+    _WHITESPACE_RE = re.compile(r'\s+')
     
     # Food-related synonyms for query expansion
     FOOD_SYNONYMS = {
@@ -37,71 +41,88 @@ class QueryProcessor:
         'location': ['locations', 'branch', 'branches', 'outlet', 'outlets'],
         'hours': ['timing', 'time', 'schedule', 'opening hours']
     }
+    # expand_query uses at most two synonyms per word
+    _SYNONYMS_TOP2 = {word: tuple(synonyms[:2]) for word, synonyms in FOOD_SYNONYMS.items()}
     
     def __init__(self):
-        self.stop_words = self.FILLER_WORDS
+        # These depend only on the query string, and voice clients repeat the
+        # same utterances, so memoize them per instance
+        self.clean_query = functools.lru_cache(maxsize=1024)(self.clean_query)
+        self._analyze = functools.lru_cache(maxsize=1024)(self._analyze)
     
     def clean_query(self, query: str) -> str:
         """Remove filler words and normalize query"""
         if not query:
             return ""
         
-        # Convert to lowercase
-        query_lower = query.lower().strip()
-        
-        # Remove extra whitespace
-        query_lower = re.sub(r'\s+', ' ', query_lower)
-        
-        # Split into words
-        words = query_lower.split()
+        # Lowercase and collapse whitespace
+        query_lower = self._WHITESPACE_RE.sub(' ', query.lower().strip())
         
         # Remove filler words
+        words = query_lower.split()
         filtered_words = [w for w in words if w not in self.FILLER_WORDS]
         
         # If we removed too much, keep original but clean it
         if len(filtered_words) < 2:
             # Just remove common fillers but keep structure
-            filtered_words = [w for w in words if w not in ['hi', 'hello', 'hey', 'please']]
+            filtered_words = [w for w in words if w not in self._GREETING_WORDS]
         
         return ' '.join(filtered_words) if filtered_words else query_lower
     
     def extract_key_terms(self, query: str) -> List[str]:
         """Extract key terms from query for better matching"""
+        # Fresh lists per call: callers extend the returned term lists
+        restaurants, food_terms, numbers, cleaned, _ = self._analyze(query)
+        return {
+            'restaurants': list(restaurants),
+            'food_terms': list(food_terms),
+            'numbers': list(numbers),
+            'cleaned_query': cleaned
+        }
+    
+    def _analyze(self, query: str) -> tuple:
+        """(restaurants, food_terms, numbers, cleaned_query, search_query) from
+        one cleaning and one split of the query"""
         cleaned = self.clean_query(query)
+        words = cleaned.split()
         
         # Extract restaurant names (common ones)
         restaurant_keywords = ['kfc', 'pizza hut', 'cheezious', 'pizza', 'burger', 'chicken']
         found_restaurants = [r for r in restaurant_keywords if r in cleaned]
         
         # Extract food-related terms
-        food_terms = []
-        for word in cleaned.split():
-            if word in ['deal', 'price', 'menu', 'pizza', 'burger', 'chicken', 'combo', 'delivery']:
-                food_terms.append(word)
+        food_terms = [w for w in words if w in ('deal', 'price', 'menu', 'pizza', 'burger', 'chicken', 'combo', 'delivery')]
         
         # Extract numbers (for quantities, prices)
         numbers = re.findall(r'\d+', query)
         
-        return {
-            'restaurants': found_restaurants,
-            'food_terms': food_terms,
-            'numbers': numbers,
-            'cleaned_query': cleaned
-        }
+        # Search query: restaurant names first (high priority), then food
+        # terms, then up to 5 remaining important words
+        search_terms = found_restaurants + food_terms
+        remaining_words = [w for w in words
+                          if w not in search_terms and w not in self.FILLER_WORDS]
+        search_terms.extend(remaining_words[:5])
+        search_query = ' '.join(search_terms) if search_terms else cleaned
+        
+        return tuple(found_restaurants), tuple(food_terms), tuple(numbers), cleaned, search_query
     
     def expand_query(self, query: str) -> List[str]:
         """Generate query variations for better retrieval"""
         cleaned = self.clean_query(query)
+        words = cleaned.split()
+        hits = [i for i, word in enumerate(words) if word in self._SYNONYMS_TOP2]
+        if not hits:
+            return [cleaned]
+        
         variations = [cleaned]  # Start with cleaned query
         
-        # Add synonym expansions
-        words = cleaned.split()
-        for i, word in enumerate(words):
-            if word in self.FOOD_SYNONYMS:
-                for synonym in self.FOOD_SYNONYMS[word][:2]:  # Limit to 2 synonyms
-                    expanded = words.copy()
-                    expanded[i] = synonym
-                    variations.append(' '.join(expanded))
+        # Add synonym expansions, swapping each word in and out of one buffer
+        for i in hits:
+            word = words[i]
+            for synonym in self._SYNONYMS_TOP2[word]:
+                words[i] = synonym
+                variations.append(' '.join(words))
+            words[i] = word
         
         # Remove duplicates while preserving order
         seen = set()
@@ -155,29 +176,7 @@ class QueryProcessor:
     
     def create_search_query(self, original_query: str) -> str:
         """Create optimized search query from user input"""
-        # Clean the query
-        cleaned = self.clean_query(original_query)
-        
-        # Extract key terms
-        key_terms = self.extract_key_terms(original_query)
-        
-        # Build search query prioritizing key terms
-        search_terms = []
-        
-        # Add restaurant names first (high priority)
-        if key_terms['restaurants']:
-            search_terms.extend(key_terms['restaurants'])
-        
-        # Add food terms
-        if key_terms['food_terms']:
-            search_terms.extend(key_terms['food_terms'])
-        
-        # Add remaining important words
-        remaining_words = [w for w in cleaned.split() 
-                          if w not in search_terms and w not in self.FILLER_WORDS]
-        search_terms.extend(remaining_words[:5])  # Limit to 5 additional words
-        
-        return ' '.join(search_terms) if search_terms else cleaned
+        return self._analyze(original_query)[4]
     
     def normalize_query(self, query: str) -> str:
         """Normalize query for consistent processing"""
@@ -1,28 +1,99 @@
-import json
 import os
+import heapq
+import logging
+import operator
 from typing import Dict, List, Tuple, Optional
 import re
 import numpy as np
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 
 # Import production-grade utilities
 from .query_processor import QueryProcessor
 from .reranker import Reranker
 from .context_filter import ContextFilter
 from services import neon_vector_store
+from services.embedding_model import load_embedding_model
+from services.response_cache import QueryCache
+from services.semantic_cache import SemanticCache
+
+logger = logging.getLogger("rag.retrieval")
 
 # Minimum similarity threshold - using adaptive threshold based on results
-# We'll use top-K ranking with reranking instead of strict filtering
+# We'll use top-K ranking with reranking instead of strict filtering.
+# NeonDB returns cosine similarity (1 - cosine distance), so this is on [-1, 1]
 MIN_SIMILARITY_THRESHOLD = -0.5  # Allow negative similarities, reranker will handle quality
 
+# Food category -> keywords, each compiled to one substring alternation
+_FOOD_CATEGORIES = {
+    "pizza": ["pizza", "margherita", "pepperoni", "pan pizza", "stuffed crust"],
+    "burger": ["burger", "cheeseburger", "chicken burger", "beef burger"],
+    "chicken": ["chicken", "fried chicken", "grilled chicken", "chicken wings", "zinger"],
+    "pasta": ["pasta", "spaghetti", "macaroni", "penne", "fettuccine"],
+    "sandwich": ["sandwich", "sub", "wrap", "panini"],
+    "rice": ["rice", "biryani", "fried rice", "pulao"],
+    "dessert": ["dessert", "ice cream", "cake", "sweet", "chocolate"],
+    "drink": ["drink", "beverage", "juice", "soda", "coffee", "tea"],
+    "combo": ["combo", "meal", "deal", "package", "set"]
+}
+_FOOD_CATEGORY_RES = tuple(
+    (category, re.compile('|'.join(re.escape(kw) for kw in keywords)))
+    for category, keywords in _FOOD_CATEGORIES.items()
+)
+
+# Price/deal questions search deeper so chunks with prices make the cut
+_PRICE_QUERY_RE = re.compile(r'price|cost|how much|deal')
+
+# Queries that want a restaurant's whole menu rather than the top hits
+_FULL_MENU_QUERY_RE = re.compile('|'.join(re.escape(kw) for kw in [
+    'menu', 'options', 'list', 'all', 'what do you have', 'items',
+    'order', 'add', 'kar do', 'karo', 'chahta', 'chahiye', 'batao',
+    'kya hai', 'option', 'available', 'milta', 'milega'
+]))
+# Context building: keep every restaurant / take more chunks for these
+_KEEP_ALL_RESTAURANTS_RE = re.compile(r'menu|options|other|anything else|else')
+_WIDE_CONTEXT_QUERY_RE = re.compile(r'menu|options|list|all|what do you have|order|add|tikka|burger|pizza')
+
+# Menu-item chunk parsing
+_DEAL_CHUNK_RE = re.compile(r'deal|offer|combo', re.IGNORECASE)
+_CHUNK_PRICE_RE = re.compile(r'rs\.?\s*(\d+)', re.IGNORECASE)
+_PRICE_COMMA_RE = re.compile(r'Rs\.\s*,\s*(\d+)')
+
+# Query type -> substring keywords, checked in order; the first match wins
+_QUERY_TYPE_RES = tuple(
+    (query_type, re.compile('|'.join(re.escape(kw) for kw in keywords)))
+    for query_type, keywords in [
+        ("deals", ["deal", "offer", "combo", "special", "promotion"]),
+        ("pricing", ["price", "cost", "how much", "expensive", "cheap"]),
+        ("location", ["location", "where", "branch", "near me", "delivery"]),
+        ("menu", ["menu", "what do you have", "options", "food"]),
+        ("timing", ["time", "hours", "open", "close", "when"]),
+    ]
+)
+
+def _top_per_restaurant(rows: List[Dict], k: int) -> List[Dict]:
+    """The first k rows of each restaurant, keeping the rows' order"""
+    counts: Dict[str, int] = {}
+    kept = []
+    for row in rows:
+        n = counts.get(row["restaurant_id"], 0)
+        if n < k:
+            kept.append(row)
+            counts[row["restaurant_id"]] = n + 1
+    return kept
+
 class MultiRestaurantRAGSystem:
     def __init__(self, data_dir: str = "data", vector_db_dir: str = "vector_db", use_vector_db: bool = True):
         self.data_dir = data_dir
         self.vector_db_dir = vector_db_dir
         self.use_vector_db = use_vector_db # Should always be True in production
         self.restaurant_index = {"restaurants": [], "default_restaurant": "cheezious"}
+        self.restaurant_names: Dict[str, str] = {}  # restaurant_id -> name
+        self._restaurant_keyword_re: Optional[re.Pattern] = None  # any restaurant keyword
+        self._restaurant_keywords: frozenset = frozenset()  # distinct keywords across restaurants
+        self._all_restaurant_ids: Tuple[str, ...] = ()  # every indexed restaurant, in index order
+        self.restaurant_food_categories: Dict[str, frozenset] = {}  # restaurant_id -> categories, when known
+        self._restaurant_focus_keys: Dict[str, frozenset] = {}  # restaurant_id -> {lowered id, lowered name}
         
         # Initialize vector DB components
         self.vector_client = None
@@ -30,6 +101,19 @@ class MultiRestaurantRAGSystem:
         self.index_collection = None
         self.embedding_model = None
         
+        # Ranked chunks per query and restaurant scope, by exact query and by
+        # near-identical query embedding; reset whenever the index reloads
+        self.retrieval_cache: Optional[QueryCache] = None
+        self.semantic_retrieval_cache: Optional[SemanticCache] = None
+        self._reset_retrieval_caches()
+        # Embeddings by processed search text. They only depend on the model,
+        # so unlike the retrieval caches they survive index reloads; different
+        # phrasings often clean down to the same search text
+        self.embedding_cache = QueryCache(
+            max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+            ttl_seconds=int(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+        )
+        
         # Initialize production-grade components
         self.query_processor = QueryProcessor()
         self.reranker = Reranker()
@@ -42,29 +126,44 @@ class MultiRestaurantRAGSystem:
         if self.use_vector_db:
             try:
                 self._initialize_vector_db()
-                print("✅ Vector database initialized")
+                logger.info("✅ Vector database initialized")
             except Exception as e:
-                print(f"⚠️  Vector DB initialization failed: {e}")
+                logger.warning("⚠️  Vector DB initialization failed: %s", e)
                 # We do NOT fallback to JSON anymore
     
     def _initialize_vector_db(self):
         """Initialize ChromaDB client and collections"""
         if not os.path.exists(self.vector_db_dir):
             # In production, we might want to log this but keep going if NeonDB is primary
-            print(f"⚠️ Vector DB directory not found: {self.vector_db_dir}")
+            logger.warning("⚠️ Vector DB directory not found: %s", self.vector_db_dir)
         
         try:
             # Initialize embedding model (force CPU for stability on Mac)
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
-            print(f"✅ Embedding model loaded")
+            self.embedding_model = load_embedding_model(device='cpu')
+            logger.info("✅ Embedding model loaded")
         except Exception as e:
             raise Exception(f"Failed to load embedding model: {e}")
     
+    def _reset_retrieval_caches(self):
+        """Drop cached retrieval results (restaurant data may have changed)"""
+        ttl = int(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+        self.retrieval_cache = QueryCache(
+            max_size=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+            ttl_seconds=ttl
+        )
+        self.semantic_retrieval_cache = SemanticCache(
+            threshold=float(os.getenv("RETRIEVAL_SEMANTIC_THRESHOLD", "0.97")),
+            max_size=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+            ttl_seconds=ttl
+        )
+    
     def load_restaurant_index(self):
         """Load the restaurant index STRICTLY from NeonDB (restaurant_embeddings table)"""
+        self._reset_retrieval_caches()
         try:
             # Clear existing index to ensure consistency with DB
             self.restaurant_index = {"restaurants": [], "default_restaurant": "cheezious"}
+            restaurant_names = {}
             
             # Load from NeonDB
             try:
@@ -96,14 +195,41 @@ class MultiRestaurantRAGSystem:
                         "keywords": kws,
                         "dynamic": True
                     })
-                    print(f"✅ Synced {name_clean} (with {len(kws)} aliases) from database to RAG index")
+                    restaurant_names[rid] = name_clean
+                    logger.info("✅ Synced %s (with %s aliases) from database to RAG index", name_clean, len(kws))
             except Exception as e:
-                print(f"❌ Failed to fetch restaurants from DB: {e}")
+                logger.error("❌ Failed to fetch restaurants from DB: %s", e)
 
-            print(f"✅ Loaded total of {len(self.restaurant_index['restaurants'])} restaurants from database")
+            self.restaurant_names = restaurant_names
+            self.restaurant_food_categories = {
+                r["id"]: frozenset(r["food_categories"])
+                for r in self.restaurant_index["restaurants"] if r.get("food_categories")
+            }
+            self._restaurant_focus_keys = {
+                rid: frozenset((rid.lower(), name.lower())) for rid, name in restaurant_names.items()
+            }
+            self._restaurant_keywords = frozenset(
+                kw for r in self.restaurant_index["restaurants"] for kw in r["keywords"]
+            )
+            self._all_restaurant_ids = tuple(r["id"] for r in self.restaurant_index["restaurants"])
+            self._restaurant_keyword_re = self._compile_restaurant_keywords()
+            logger.info("✅ Loaded total of %s restaurants from database", len(self.restaurant_index['restaurants']))
         except Exception as e:
-            print(f"❌ Error loading restaurant index: {e}")
+            logger.error("❌ Error loading restaurant index: %s", e)
             self.restaurant_index = {"restaurants": [], "default_restaurant": "cheezious"}
+            self.restaurant_names = {}
+            self.restaurant_food_categories = {}
+            self._restaurant_focus_keys = {}
+            self._restaurant_keywords = frozenset()
+            self._all_restaurant_ids = ()
+            self._restaurant_keyword_re = None
+    
+    def _compile_restaurant_keywords(self) -> Optional[re.Pattern]:
+        """One alternation over every restaurant keyword, used to reject queries
+        that mention no restaurant in a single scan"""
+        if not self._restaurant_keywords:
+            return None
+        return re.compile('|'.join(re.escape(kw) for kw in self._restaurant_keywords))
     
     def load_all_restaurants(self):
         """No longer used as we are strictly DB-only"""
@@ -117,7 +243,7 @@ class MultiRestaurantRAGSystem:
         query_lower = query.lower()
         detected_restaurants = []
         
-        print(f"🔍 Analyzing query for multiple restaurants: '{query}'")
+        logger.debug("🔍 Analyzing query for multiple restaurants: '%s'", query)
         
         # First, check for explicit restaurant name mentions
         explicit_restaurants = self._detect_explicit_restaurant_mentions(query_lower)
@@ -147,15 +273,22 @@ class MultiRestaurantRAGSystem:
         detected_restaurants = list(all_detected.values())
         detected_restaurants.sort(key=lambda x: x["confidence"], reverse=True)
         
-        print(f"🎯 Detected restaurants: {[r['name'] for r in detected_restaurants]}")
-        for restaurant in detected_restaurants:
-            print(f"   - {restaurant['name']}: {restaurant['confidence']:.2f} ({restaurant.get('detection_type', 'unknown')})")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🎯 Detected restaurants: %s", [r['name'] for r in detected_restaurants])
+            for restaurant in detected_restaurants:
+                logger.debug("   - %s: %.2f (%s)", restaurant['name'], restaurant['confidence'], restaurant.get('detection_type', 'unknown'))
         
         return detected_restaurants
     
     def _detect_explicit_restaurant_mentions(self, query_lower: str) -> List[Dict]:
         """Detect explicit restaurant name mentions in the query"""
         explicit_restaurants = []
+        if self._restaurant_keyword_re is None or not self._restaurant_keyword_re.search(query_lower):
+            return explicit_restaurants
+        
+        # Scan for each distinct keyword once; aliases shared by several
+        # restaurants (or listed twice) are then set lookups
+        mentioned = {kw for kw in self._restaurant_keywords if kw in query_lower}
         
         for restaurant in self.restaurant_index.get("restaurants", []):
             restaurant_id = restaurant["id"]
@@ -163,12 +296,13 @@ class MultiRestaurantRAGSystem:
             confidence = 0.0
             keywords_found = []
             
-            # Check for direct restaurant name mentions (highest priority)
+            # Check for direct restaurant name mentions (highest priority);
+            # keywords are lowercased when the index is loaded
             for keyword in restaurant.get("keywords", []):
-                if keyword.lower() in query_lower:
+                if keyword in mentioned:
                     confidence += 2.0  # Higher weight for explicit mentions
                     keywords_found.append(keyword)
-                    print(f"✅ Found explicit restaurant keyword '{keyword}' for {restaurant_name}")
+                    logger.debug("✅ Found explicit restaurant keyword '%s' for %s", keyword, restaurant_name)
             
             if confidence > 0:
                 explicit_restaurants.append({
@@ -185,43 +319,25 @@ class MultiRestaurantRAGSystem:
         """Detect restaurants based on food categories mentioned in the query"""
         food_category_restaurants = []
         
-        # Define food category mappings
-        food_categories = {
-            "pizza": ["pizza", "margherita", "pepperoni", "pan pizza", "stuffed crust"],
-            "burger": ["burger", "cheeseburger", "chicken burger", "beef burger"],
-            "chicken": ["chicken", "fried chicken", "grilled chicken", "chicken wings", "zinger"],
-            "pasta": ["pasta", "spaghetti", "macaroni", "penne", "fettuccine"],
-            "sandwich": ["sandwich", "sub", "wrap", "panini"],
-            "rice": ["rice", "biryani", "fried rice", "pulao"],
-            "dessert": ["dessert", "ice cream", "cake", "sweet", "chocolate"],
-            "drink": ["drink", "beverage", "juice", "soda", "coffee", "tea"],
-            "combo": ["combo", "meal", "deal", "package", "set"]
-        }
-        
         # Find which food categories are mentioned in the query
-        mentioned_categories = []
-        for category, keywords in food_categories.items():
-            for keyword in keywords:
-                if keyword in query_lower:
-                    mentioned_categories.append(category)
-                    break
+        mentioned_categories = [category for category, pattern in _FOOD_CATEGORY_RES if pattern.search(query_lower)]
         
-        print(f"🍽️ Detected food categories: {mentioned_categories}")
+        logger.debug("🍽️ Detected food categories: %s", mentioned_categories)
+        if not mentioned_categories:
+            return food_category_restaurants
         
-        # Check each restaurant for these food categories
-        for restaurant in self.restaurant_index.get("restaurants", []):
-            restaurant_id = restaurant["id"]
-            restaurant_name = restaurant["name"]
+        # Check each restaurant with known categories for these food categories
+        for restaurant_id, food_cats in self.restaurant_food_categories.items():
+            restaurant_name = self.restaurant_names[restaurant_id]
             confidence = 0.0
             matching_categories = []
             
             # Check if restaurant has items in the mentioned categories
-            food_cats = restaurant.get("food_categories", [])
             for category in mentioned_categories:
                 if category in food_cats:
                     confidence += 1.0
                     matching_categories.append(category)
-                    print(f"✅ {restaurant_name} has {category} items")
+                    logger.debug("✅ %s has %s items", restaurant_name, category)
             
             if confidence > 0:
                 food_category_restaurants.append({
@@ -234,137 +350,206 @@ class MultiRestaurantRAGSystem:
         
         return food_category_restaurants
     
-    def _l2_to_similarity(self, distance: float) -> float:
-        """
-        Convert L2 (Euclidean) distance to similarity score.
-        ChromaDB uses L2 distance by default for embeddings.
-        Similarity = 1 / (1 + distance) for normalized embeddings
-        """
-        # For normalized embeddings, L2 distance ranges roughly 0-2
-        # Convert to similarity using inverse relationship
-        if distance <= 0:
-            return 1.0
-        # Use sigmoid-like function for better distribution
-        similarity = 1.0 / (1.0 + distance)
-        return max(0.0, similarity)
-    
-    def _hybrid_search(self, query: str, restaurant_ids: Optional[List[str]] = None, top_k: int = 15) -> List[Dict]:
-        """
-        Hybrid search combining semantic and keyword matching for production-grade retrieval
-        """
-        if not self.use_vector_db or not self.restaurant_collection:
-            return []
-        
-        # Process query using production-grade processor
-        processed_query = self.query_processor.create_search_query(query)
-        query_terms = self.query_processor.extract_key_terms(query)['food_terms']
-        query_terms.extend(self.query_processor.extract_key_terms(query)['restaurants'])
-        
-        print(f"🔍 Original: '{query}'")
-        print(f"🔍 Processed: '{processed_query}'")
-        print(f"🔍 Key terms: {query_terms}")
-        
-        # Build where clause
-        where_clause = {}
-        if restaurant_ids and len(restaurant_ids) == 1:
-            where_clause = {"restaurant_id": restaurant_ids[0]}
-        elif restaurant_ids:
-            where_clause = None
-        
-        # Semantic search using NeonDB (pgvector)
+    def _search_depth(self, query: str, n_restaurants: int, top_k: int) -> int:
+        """How many candidates to pull from the vector store before reranking"""
         # Increase search_k to ensure we find chunks with prices when user asks about prices
-        query_lower = query.lower()
-        if any(kw in query_lower for kw in ['price', 'prices', 'cost', 'how much', 'deal']):
+        if _PRICE_QUERY_RE.search(query.lower()):
             # For price/deal queries, search more chunks to find ones with prices
-            search_k = min(top_k * 3, 20)
-        else:
-            search_k = min(top_k * 2, 15) if restaurant_ids and len(restaurant_ids) > 1 else min(top_k * 2, 10)
-        
-        retrieved_chunks = []
-        try:
-            # Generate embedding for the query
-            query_embedding = self.embedding_model.encode(processed_query)
-            
-            # Determine target restaurant_id (if single)
-            target_rid = None
-            if restaurant_ids and len(restaurant_ids) == 1:
-                target_rid = restaurant_ids[0]
-            
-            db_results = neon_vector_store.search_similar(
-                query_embedding=query_embedding,
-                top_k=search_k,
-                restaurant_id=target_rid
-            )
+            return min(top_k * 3, 20)
+        return min(top_k * 2, 15) if n_restaurants > 1 else min(top_k * 2, 10)
+
+    def _rank_chunks(self, query: str, query_terms: List[str], db_results: List[Dict], top_k: int) -> List[Dict]:
+        """Filter raw vector store rows and re-rank them for one query"""
+        # Score the raw rows and only build chunk dicts for the top_k that are
+        # returned. A row carries the restaurant_name the metadata score reads
+        scored = []
+        if db_results:
+            logger.debug("📊 Found %s chunks from NeonDB semantic search", len(db_results))
+            for row in db_results:
+                similarity = float(row["similarity"])
+                
+                # Only filter extremely poor matches
+                if similarity < MIN_SIMILARITY_THRESHOLD:
+                    continue
+                
+                rerank_score = self.reranker.score_fields(row["content"], similarity, row, query, query_terms)
+                # Combine semantic similarity (40%) with rerank score (60%)
+                final_score = (similarity * 0.4) + (rerank_score * 0.6)
+                scored.append((final_score, rerank_score, similarity, row))
             
-            if db_results:
-                print(f"📊 Found {len(db_results)} chunks from NeonDB semantic search")
-                for row in db_results:
-                    # Filter by restaurant_ids if multiple specified
-                    if restaurant_ids and len(restaurant_ids) > 1:
-                        if row["restaurant_id"] not in restaurant_ids:
-                            continue
-                    
-                    similarity = float(row["similarity"])
-                    
-                    # Only filter extremely poor matches
-                    if similarity < MIN_SIMILARITY_THRESHOLD:
-                        continue
-                    
-                    metadata = {
+        # Re-rank chunks using production-grade reranker
+        if scored:
+            logger.debug("🔄 Re-ranked %s chunks", len(scored))
+            # Respect top_k — for menu/order queries this allows all items to come through.
+            # Best by final score, ties keep the rerank order
+            final_chunks = [
+                {
+                    "restaurant_id": row["restaurant_id"],
+                    "restaurant_name": row["restaurant_name"],
+                    "content": row["content"],
+                    "meta_tag": row["meta_tag"],
+                    "similarity": similarity,
+                    "metadata": {
                         "restaurant_id": row["restaurant_id"],
                         "restaurant_name": row["restaurant_name"],
                         "chunk_index": row["chunk_index"],
                         "pdf_filename": row["pdf_filename"]
-                    }
-                    
-                    retrieved_chunks.append({
-                        "restaurant_id": row["restaurant_id"],
-                        "restaurant_name": row["restaurant_name"],
-                        "content": row["content"],
-                        "similarity": similarity,
-                        "metadata": metadata
-                    })
-        except Exception as e:
-            print(f"❌ Error in vector search: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
-            
-        # Re-rank chunks using production-grade reranker
-        if retrieved_chunks:
-            print(f"🔄 Re-ranking {len(retrieved_chunks)} chunks...")
-            reranked_chunks = self.reranker.rerank(retrieved_chunks, query, query_terms)
+                    },
+                    "rerank_score": rerank_score,
+                    "final_score": final_score
+                }
+                for final_score, rerank_score, similarity, row in heapq.nlargest(top_k, scored, key=operator.itemgetter(0, 1))
+            ]
+            logger.debug("✅ Returning %s top-ranked chunks", len(final_chunks))
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, chunk in enumerate(final_chunks[:3]):  # Log top 3
+                    logger.debug("  %s. %s (score: %.3f, similarity: %.3f, rerank: %.3f)", i + 1, chunk['restaurant_name'], chunk['final_score'], chunk['similarity'], chunk['rerank_score'])
             
-            # Update similarity with rerank score for final sorting
-            for chunk in reranked_chunks:
-                # Combine semantic similarity (40%) with rerank score (60%)
-                chunk['final_score'] = (chunk['similarity'] * 0.4) + (chunk['rerank_score'] * 0.6)
+            return final_chunks
+        
+        return []
+
+    def _hybrid_search(self, queries: List[str], restaurant_ids: Optional[List[str]] = None, top_k: int = 15) -> List[List[Dict]]:
+        """
+        Hybrid search combining semantic and keyword matching for production-grade retrieval.
+        Repeated and near-identical queries are served from the retrieval caches; the
+        rest are embedded in one encode call and searched in one NeonDB round trip.
+        """
+        # Retrieval runs entirely against NeonDB; the Chroma collections are
+        # only written by the offline builder, so they do not gate it
+        if not self.use_vector_db or self.embedding_model is None:
+            return [[] for _ in queries]
+        
+        scope = f"{','.join(sorted(restaurant_ids or []))}|{top_k}"
+        results: List[Optional[List[Dict]]] = [None] * len(queries)
+        cache_keys = []
+        for i, query in enumerate(queries):
+            cache_keys.append(self.retrieval_cache.make_key(query, scope))
+            cached = self.retrieval_cache.get(cache_keys[i])
+            if cached is not None:
+                results[i] = [dict(c) for c in cached["chunks"]]
+        
+        pending = [i for i, chunks in enumerate(results) if chunks is None]
+        if not pending:
+            logger.debug("⚡ Retrieval served from cache")
+            return results
+        
+        # Process queries using production-grade processor
+        processed_queries = []
+        query_terms_list = []
+        for i in pending:
+            query = queries[i]
+            processed_query = self.query_processor.create_search_query(query)
+            key_terms = self.query_processor.extract_key_terms(query)
+            query_terms = key_terms['food_terms'] + key_terms['restaurants']
+            processed_queries.append(processed_query)
+            query_terms_list.append(query_terms)
             
-            # Sort by final score
-            reranked_chunks.sort(key=lambda x: x['final_score'], reverse=True)
+            logger.debug("🔍 Original: '%s'", query)
+            logger.debug("🔍 Processed: '%s'", processed_query)
+            logger.debug("🔍 Key terms: %s", query_terms)
+        
+        try:
+            query_embeddings = self._embed(processed_queries)
+        except Exception as e:
+            logger.exception("❌ Error in vector search: %s", e)
+            return [chunks or [] for chunks in results]
+        
+        # Near-identical phrasings reuse the ranked chunks of an earlier query
+        searches = []
+        for j, i in enumerate(pending):
+            cached = self.semantic_retrieval_cache.get(scope, query_embeddings[j])
+            if cached is not None:
+                results[i] = [dict(c) for c in cached["chunks"]]
+            else:
+                searches.append(j)
+        
+        if searches:
+            n_restaurants = len(restaurant_ids) if restaurant_ids else 0
+            search_ks = [self._search_depth(queries[pending[j]], n_restaurants, top_k) for j in searches]
             
-            # Respect top_k — for menu/order queries this allows all items to come through
-            final_chunks = reranked_chunks[:top_k]
-            print(f"✅ Returning {len(final_chunks)} top-ranked chunks")
-            for i, chunk in enumerate(final_chunks[:3]):  # Log top 3
-                print(f"  {i+1}. {chunk['restaurant_name']} (score: {chunk['final_score']:.3f}, similarity: {chunk['similarity']:.3f}, rerank: {chunk['rerank_score']:.3f})")
+            # Semantic search using NeonDB (pgvector)
+            try:
+                # Restrict the scan to the requested restaurants in SQL. Several
+                # restaurants are searched top-K each, so one restaurant with
+                # many close chunks cannot crowd the others out of the rerank
+                target_rid = None
+                target_rids = None
+                if n_restaurants == 1:
+                    target_rid = restaurant_ids[0]
+                elif n_restaurants > 1:
+                    target_rids = restaurant_ids
+                
+                if len(searches) == 1:
+                    db_results = [neon_vector_store.search_similar(
+                        query_embedding=query_embeddings[searches[0]],
+                        top_k=search_ks[0],
+                        restaurant_id=target_rid,
+                        restaurant_ids=target_rids
+                    )]
+                else:
+                    db_results = neon_vector_store.search_similar_batch(
+                        query_embeddings=query_embeddings[searches],
+                        top_k=max(search_ks),
+                        restaurant_id=target_rid,
+                        restaurant_ids=target_rids
+                    )
+                    # The batch ran at the deepest k; cut each query back to its own
+                    # (per restaurant, when several are targeted)
+                    db_results = [
+                        _top_per_restaurant(rows, k) if target_rids else rows[:k]
+                        for rows, k in zip(db_results, search_ks)
+                    ]
+            except Exception as e:
+                logger.exception("❌ Error in vector search: %s", e)
+                return [chunks or [] for chunks in results]
             
-            return final_chunks
+            for j, rows in zip(searches, db_results):
+                i = pending[j]
+                chunks = self._rank_chunks(queries[i], query_terms_list[j], rows, top_k)
+                self.retrieval_cache.put(cache_keys[i], {"chunks": [dict(c) for c in chunks]})
+                self.semantic_retrieval_cache.put(scope, query_embeddings[j], {"chunks": [dict(c) for c in chunks]})
+                results[i] = chunks
         
-        return []
+        return results
+    
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Normalized embeddings for texts, encoding only the ones not cached, in one call"""
+        keys = [self.embedding_cache.make_key(t) for t in texts]
+        vectors: List[Optional[np.ndarray]] = []
+        for key in keys:
+            cached = self.embedding_cache.get(key)
+            vectors.append(cached["embedding"] if cached is not None else None)
+        
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # Generate embeddings for all uncached queries at once
+            encoded = self.embedding_model.encode(
+                [texts[i] for i in missing], batch_size=32, convert_to_numpy=True, normalize_embeddings=True
+            )
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                self.embedding_cache.put(keys[i], {"embedding": vector})
+        return np.stack(vectors)
     
     def search_vector_db(self, query: str, restaurant_ids: Optional[List[str]] = None, top_k: int = 10) -> List[Dict]:
         """
         Production-grade vector database search with hybrid retrieval and reranking
         """
+        return self.batch_search_vector_db([query], restaurant_ids, top_k)[0]
+    
+    def batch_search_vector_db(self, queries: List[str], restaurant_ids: Optional[List[str]] = None, top_k: int = 10) -> List[List[Dict]]:
+        """
+        Search several sub-queries at once; returns one result list per query
+        """
+        if not queries:
+            return []
         try:
-            return self._hybrid_search(query, restaurant_ids, top_k)
+            return self._hybrid_search(queries, restaurant_ids, top_k)
         except Exception as e:
-            print(f"❌ Error in vector DB search: {e}")
-            import traceback
-            traceback.print_exc()
-            # Return empty list on error, system will fall back gracefully
-            return []
+            logger.exception("❌ Error in vector DB search: %s", e)
+            # Return empty lists on error, system will fall back gracefully
+            return [[] for _ in queries]
     
     def search_comprehensive_info(self, query: str, restaurant_ids: List[str] = None, top_k: int = 20) -> Dict:
         """
@@ -372,7 +557,7 @@ class MultiRestaurantRAGSystem:
         Uses vector DB if available, falls back to JSON
         """
         if restaurant_ids is None:
-            restaurant_ids = [r["id"] for r in self.restaurant_index.get("restaurants", [])]
+            restaurant_ids = list(self._all_restaurant_ids)
         
         comprehensive_results = {
             "query": query,
@@ -382,11 +567,14 @@ class MultiRestaurantRAGSystem:
         }
         
         if self.use_vector_db:
+            # Determine if we should get ALL chunks (broad query)
+            is_broad_query = bool(_FULL_MENU_QUERY_RE.search(query.lower()))
+            
             # Use production-grade hybrid search with error handling
             try:
                 retrieved_chunks = self.search_vector_db(query, restaurant_ids, top_k=top_k)
             except Exception as e:
-                print(f"❌ Error in comprehensive search: {e}")
+                logger.error("❌ Error in comprehensive search: %s", e)
                 retrieved_chunks = []
             
             # Group similarity chunks by restaurant
@@ -397,31 +585,30 @@ class MultiRestaurantRAGSystem:
                     restaurant_chunks[rid] = []
                 restaurant_chunks[rid].append(chunk)
 
+            # Broad queries take every chunk of every restaurant; otherwise
+            # restaurants with few hits are supplemented. Either way, fetch
+            # all the full chunk lists needed in one round trip
+            full_chunk_rids = [
+                rid for rid in restaurant_ids
+                if is_broad_query or len(restaurant_chunks.get(rid, [])) < 3
+            ]
+            all_chunks = neon_vector_store.get_restaurant_chunks_batch(full_chunk_rids) if full_chunk_rids else {}
+            
             # Build results structure
             for rid in restaurant_ids:
                 # Find the name for this rid
-                restaurant_name = next(
-                    (r["name"] for r in self.restaurant_index.get("restaurants", []) if r["id"] == rid),
-                    rid
-                )
-                
-                # Determine if we should get ALL chunks (broad query)
-                is_broad_query = any(kw in query.lower() for kw in [
-                    'menu', 'options', 'list', 'all', 'what do you have', 'items',
-                    'order', 'add', 'kar do', 'karo', 'chahta', 'chahiye', 'batao',
-                    'kya hai', 'option', 'available', 'milta', 'milega'
-                ])
+                restaurant_name = self.restaurant_names.get(rid, rid)
                 
                 chunks = []
                 if is_broad_query:
-                    print(f"📄 Fetching ALL chunks for {restaurant_name} (Broad Query)")
-                    chunks = neon_vector_store.get_restaurant_chunks(rid)
+                    logger.debug("📄 Fetching ALL chunks for %s (Broad Query)", restaurant_name)
+                    chunks = all_chunks[rid]
                 else:
                     # Filter retrieved chunks for this restaurant
                     chunks = restaurant_chunks.get(rid, [])
                     # If few chunks, supplement slightly
                     if len(chunks) < 3:
-                        more_chunks = neon_vector_store.get_restaurant_chunks(rid)
+                        more_chunks = all_chunks[rid]
                         
                         # Helper to get chunk index correctly regardless of source
                         def get_idx(c):
@@ -444,10 +631,10 @@ class MultiRestaurantRAGSystem:
                     content = chunk["content"]
                     tag = chunk.get("meta_tag")
                     if tag == "menu items":
-                        if any(w in content.lower() for w in ["deal", "offer", "combo"]):
+                        if _DEAL_CHUNK_RE.search(content):
                             deals.append({"name": "Deal", "description": content})
                         else:
-                            price_m = re.search(r'rs\.?\s*(\d+)', content.lower())
+                            price_m = _CHUNK_PRICE_RE.search(content)
                             price = f"Rs. {price_m.group(1)}" if price_m else "Price N/A"
                             menu_items.append({"name": "Item", "price": price, "description": content})
                     elif tag in ["general information", "restaurant identity"]:
@@ -478,30 +665,36 @@ class MultiRestaurantRAGSystem:
         context_parts = []
         query = search_results.get("query", "").lower()
         
-        # If user asked about a specific restaurant, only include that one
-        restaurants_to_include = search_results["results"]
         # Resolve focus_restaurant: only exclude others if focus is VERY dominant
         restaurants_to_include = search_results["results"]
         if focus_restaurant and len(search_results["results"]) > 1:
             # If focusing, check if the other restaurants might be relevant
             # If the query type is 'menu' or 'general', we should probably keep them
-            is_broad = any(kw in query for kw in ['menu', 'options', 'other', 'anything else', 'else'])
+            is_broad = bool(_KEEP_ALL_RESTAURANTS_RE.search(query))
             
             if is_broad:
-                print(f"🔄 Broad query detected, keeping all restaurants even with focus on {focus_restaurant}")
+                logger.debug("🔄 Broad query detected, keeping all restaurants even with focus on %s", focus_restaurant)
             else:
-                filtered = {
-                    rid: info for rid, info in search_results["results"].items()
-                    if rid.lower() == focus_restaurant.lower() or info["name"].lower() == focus_restaurant.lower()
-                }
+                focus = focus_restaurant.lower()
+                filtered = {}
+                for rid, info in search_results["results"].items():
+                    keys = self._restaurant_focus_keys.get(rid)
+                    if keys is None:
+                        keys = (rid.lower(), info["name"].lower())
+                    if focus in keys:
+                        filtered[rid] = info
                 if filtered:
                     # Only focus if we have a very clear reason to exclude others
                     # For now, let's be inclusive if multiple detections exist
                     if len(search_results["results"]) <= 2:
-                        print(f"🎯 Focusing on {focus_restaurant}")
+                        logger.debug("🎯 Focusing on %s", focus_restaurant)
                         restaurants_to_include = filtered
                     else:
-                        print(f"ℹ️ Multiple candidates, keeping context broad")
+                        logger.debug("ℹ️ Multiple candidates, keeping context broad")
+        
+        # For broad queries or order-related extraction, we include more context to avoid missing items
+        is_broad_query = bool(_WIDE_CONTEXT_QUERY_RE.search(query))
+        max_chunks = 15 if is_broad_query else 8
         
         for restaurant_id, restaurant_info in restaurants_to_include.items():
             restaurant_name = restaurant_info["name"]
@@ -511,7 +704,7 @@ class MultiRestaurantRAGSystem:
             
             # If using vector DB, use chunks directly with intelligent selection
             if self.use_vector_db and "chunks" in data:
-                chunks = data.get("chunks", [])
+                chunks = data["chunks"]
                 
                 if chunks:
                     # Use final_score if available (from reranking), otherwise similarity
@@ -525,10 +718,6 @@ class MultiRestaurantRAGSystem:
                     selected_chunks = []
                     seen_content_prefixes = set()
                     
-                    # For broad queries or order-related extraction, we include more context to avoid missing items
-                    is_broad_query = any(kw in query for kw in ['menu', 'options', 'list', 'all', 'what do you have', 'order', 'add', 'tikka', 'burger', 'pizza'])
-                    max_chunks = 15 if is_broad_query else 8
-                    
                     for chunk in scored_chunks:
                         content_sig = chunk["content"][:100].lower()
                         if content_sig not in seen_content_prefixes:
@@ -538,49 +727,49 @@ class MultiRestaurantRAGSystem:
                                 break
                     
                     if selected_chunks:
-                        print(f"📝 Building context for {restaurant_name}: {len(selected_chunks)} chunks")
-                        chunk_texts = []
-                        
+                        logger.debug("📝 Building context for %s: %s chunks", restaurant_name, len(selected_chunks))
                         # Sort: MENU ITEMS first so LLM sees orderable items before identity/location
-                        menu_chunks = [c for c in selected_chunks if 'menu items' in c.get('meta_tag', '').lower()]
-                        other_chunks = [c for c in selected_chunks if 'menu items' not in c.get('meta_tag', '').lower()]
-                        ordered_chunks = menu_chunks + other_chunks
+                        menu_chunks = []
+                        other_chunks = []
+                        for c in selected_chunks:
+                            if 'menu items' in (c.get('meta_tag') or '').lower():
+                                menu_chunks.append(c)
+                            else:
+                                other_chunks.append(c)
                         
-                        for chunk in ordered_chunks:
-                            content = chunk['content']
-                            # The new structured chunks already start with [SECTION: ...].
-                            # For legacy chunks (old PDF format) that don't, add the tag.
-                            if not content.strip().startswith('[SECTION:'):
-                                section_tag = f"[SECTION: {chunk.get('meta_tag', 'GENERAL').upper()}]"
-                                content = f"{section_tag}\n{content}"
-                            chunk_texts.append(content)
-                        
-                        relevant_text = "\n\n---\n\n".join(chunk_texts)
+                        # The new structured chunks already start with [SECTION: ...].
+                        # For legacy chunks (old PDF format) that don't, add the tag.
+                        relevant_text = "\n\n---\n\n".join(
+                            chunk['content'] if chunk['content'].lstrip().startswith('[SECTION:')
+                            else f"[SECTION: {(chunk.get('meta_tag') or 'GENERAL').upper()}]\n{chunk['content']}"
+                            for chunk in menu_chunks + other_chunks
+                        )
                         # Fix common price formatting issues
-                        relevant_text = re.sub(r'Rs\.\s*,\s*(\d+)', r'Rs. \1', relevant_text)
+                        relevant_text = _PRICE_COMMA_RE.sub(r'Rs. \1', relevant_text)
                         
                         if relevant_text:
                             context_parts.append(relevant_text)
-                            print(f"  ✅ Added {len(relevant_text)} characters of context")
+                            logger.debug("  ✅ Added %s characters of context", len(relevant_text))
                     else:
-                        print(f"  ⚠️  No diverse chunks selected for {restaurant_name}")
+                        logger.warning("  ⚠️  No diverse chunks selected for %s", restaurant_name)
                 else:
-                    print(f"  ⚠️  No chunks found for {restaurant_name}")
+                    logger.warning("  ⚠️  No chunks found for %s", restaurant_name)
             
             context_parts.append("")  # Empty line between restaurants
         
         return "\n".join(context_parts)
 
-    def search_menu(self, query: str, restaurant_id: Optional[str] = None) -> List[Dict]:
-        """Search menu items across one or all restaurants and return flat results."""
+    def search_menu(self, query: str, restaurant_id: Optional[str] = None, top_k: Optional[int] = None) -> List[Dict]:
+        """Search menu items across one or all restaurants and return flat results,
+        best first (only the best top_k when given)."""
         results: List[Dict] = []
         query_lower = query.lower()
 
         target_ids: List[str]
-        if restaurant_id and restaurant_id in [r["id"] for r in self.restaurant_index.get("restaurants", [])]:
+        if restaurant_id and restaurant_id in self.restaurant_names:
             target_ids = [restaurant_id]
         else:
-            target_ids = [r["id"] for r in self.restaurant_index.get("restaurants", [])]
+            target_ids = list(self._all_restaurant_ids)
 
         if self.use_vector_db:
             # Use vector DB search
@@ -592,12 +781,11 @@ class MultiRestaurantRAGSystem:
                 meta_tag = chunk.get("meta_tag", "menu")
                 
                 # Extract price if available
-                price_match = re.search(r'rs\.?\s*(\d+)', content, re.IGNORECASE)
+                price_match = _CHUNK_PRICE_RE.search(content)
                 price = f"Rs. {price_match.group(1)}" if price_match else "Price N/A"
                 
-                # Extract item name (try to find it in content)
-                lines = content.split('\n')
-                item_name = lines[0][:50] if lines else "Item from PDF"
+                # Item name: the chunk's first line (only that line is split off)
+                item_name = content.partition('\n')[0][:50]
                 
                 results.append({
                     "restaurant_id": chunk["restaurant_id"],
@@ -611,7 +799,10 @@ class MultiRestaurantRAGSystem:
                     },
                     "relevance": chunk["similarity"]
                 })
-        results.sort(key=lambda x: x["relevance"], reverse=True)
+        by_relevance = operator.itemgetter("relevance")
+        if top_k is not None:
+            return heapq.nlargest(top_k, results, key=by_relevance)
+        results.sort(key=by_relevance, reverse=True)
         return results
     
     def process_query(self, query: str, summary: str = "") -> Dict:
@@ -634,15 +825,15 @@ class MultiRestaurantRAGSystem:
         )
         
         if not detected_restaurants and summary and not is_switch:
-            print(f"🔍 No restaurant in query, checking summary: '{summary[:50]}...'")
+            logger.debug("🔍 No restaurant in query, checking summary: '%s...'", summary[:50])
             detected_restaurants = self.detect_restaurants_in_query(summary)
         elif is_switch:
-            print(f"🔄 Switch intent detected ('else/other'), ignoring summary for fresh detection.")
+            logger.debug("🔄 Switch intent detected ('else/other'), ignoring summary for fresh detection.")
             
         # If still no restaurants detected, search all restaurants
         if not detected_restaurants:
-            restaurant_ids = [r["id"] for r in self.restaurant_index.get("restaurants", [])]
-            print("⚠️  No specific restaurants detected, searching all restaurants")
+            restaurant_ids = list(self._all_restaurant_ids)
+            logger.warning("⚠️  No specific restaurants detected, searching all restaurants")
         else:
             restaurant_ids = [r["id"] for r in detected_restaurants]
         
@@ -665,12 +856,12 @@ class MultiRestaurantRAGSystem:
         if explicit_restaurants and len(explicit_restaurants) == 1:
             # ONLY focus if there is exactly ONE explicit restaurant mentioned
             focus_restaurant = explicit_restaurants[0]["name"]
-            print(f"🎯 Single explicit focus: {focus_restaurant}")
+            logger.debug("🎯 Single explicit focus: %s", focus_restaurant)
         elif len(detected_restaurants) == 1:
             focus_restaurant = detected_restaurants[0]["name"]
-            print(f"🎯 Single candidate focus: {focus_restaurant}")
+            logger.debug("🎯 Single candidate focus: %s", focus_restaurant)
         else:
-            print(f"ℹ️ Broad context: {[r['name'] for r in detected_restaurants]}")
+            logger.debug("ℹ️ Broad context: %s", [r['name'] for r in detected_restaurants])
             focus_restaurant = None
         
         # Build context (only focused restaurant if specified)
@@ -691,18 +882,10 @@ class MultiRestaurantRAGSystem:
         """Classify the type of query"""
         query_lower = query.lower()
         
-        if any(word in query_lower for word in ["deal", "offer", "combo", "special", "promotion"]):
-            return "deals"
-        elif any(word in query_lower for word in ["price", "cost", "how much", "expensive", "cheap"]):
-            return "pricing"
-        elif any(word in query_lower for word in ["location", "where", "branch", "near me", "delivery"]):
-            return "location"
-        elif any(word in query_lower for word in ["menu", "what do you have", "options", "food"]):
-            return "menu"
-        elif any(word in query_lower for word in ["time", "hours", "open", "close", "when"]):
-            return "timing"
-        else:
-            return "general"
+        for query_type, pattern in _QUERY_TYPE_RES:
+            if pattern.search(query_lower):
+                return query_type
+        return "general"
     
     def _generate_smart_suggestions(self, query: str, detected_restaurants: List[Dict], search_results: Dict) -> List[str]:
         """Generate intelligent follow-up suggestions"""
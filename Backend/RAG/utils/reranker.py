@@ -4,33 +4,75 @@ Re-ranking Module for Production RAG System
 Re-ranks retrieved chunks based on multiple signals for better relevance.
 """
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 import re
+import heapq
+import operator
+import functools
 from collections import Counter
 
 
+def _substring_re(keywords) -> re.Pattern:
+    """One alternation matching any of the keywords anywhere in a string"""
+    return re.compile('|'.join(re.escape(kw) for kw in keywords))
+
+
+# Query-side signals (substring matches on the lowercased query)
+_PRICE_QUERY_RE = _substring_re(['price', 'cost', 'rs.', 'rupee', 'pkr', 'how much'])
+_DEAL_QUERY_RE = _substring_re(['deal', 'offer', 'promotion', 'special', 'combo', 'package'])
+_MENU_QUERY_RE = _substring_re(['menu', 'item', 'dish', 'food', 'order'])
+
+# Chunk-side signals (substring matches on the lowercased content)
+_PRICE_WORD_RE = _substring_re(['rs.', 'rupee', 'price', 'cost'])
+_DEAL_WORD_RE = _DEAL_QUERY_RE  # also covers 'combo' and 'package'
+_MENU_FIELD_RE = _substring_re(['name', 'description', 'item'])
+# Actual prices ("Rs. 450", "rs 450")
+_PRICE_RE = re.compile(r'rs\.?\s*\d+', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def _query_kinds(query: str) -> tuple:
+    """(is_price, is_deal, is_menu) for a query; the same for every chunk it ranks"""
+    query_lower = query.lower()
+    return (_PRICE_QUERY_RE.search(query_lower) is not None,
+            _DEAL_QUERY_RE.search(query_lower) is not None,
+            _MENU_QUERY_RE.search(query_lower) is not None)
+
+
+@functools.lru_cache(maxsize=4096)
+def _content_signals(content: str) -> tuple:
+    """(content_lower, has_price, has_price_word, has_deal_word, has_menu_field)
+    for a chunk. The same menu chunks come back query after query, so each is
+    lowercased and scanned once"""
+    content_lower = content.lower()
+    return (content_lower,
+            _PRICE_RE.search(content_lower) is not None,
+            _PRICE_WORD_RE.search(content_lower) is not None,
+            _DEAL_WORD_RE.search(content_lower) is not None,
+            _MENU_FIELD_RE.search(content_lower) is not None)
+
+
 class Reranker:
     """Re-ranks retrieved chunks using multiple relevance signals"""
     
-    def __init__(self):
-        self.price_keywords = ['price', 'cost', 'rs.', 'rupee', 'pkr', 'how much']
-        self.deal_keywords = ['deal', 'offer', 'promotion', 'special', 'combo', 'package']
-        self.menu_keywords = ['menu', 'item', 'dish', 'food', 'order']
-    
     def calculate_relevance_score(self, chunk: Dict, query: str, query_terms: List[str]) -> float:
         """Calculate comprehensive relevance score for a chunk"""
-        content = chunk.get('content', '').lower()
-        similarity = chunk.get('similarity', 0.0)
-        metadata = chunk.get('metadata', {})
+        return self.score_fields(chunk.get('content', ''), chunk.get('similarity', 0.0),
+                                 chunk.get('metadata', {}), query, query_terms)
+    
+    def score_fields(self, content: str, similarity: float, metadata: Dict, query: str, query_terms: List[str]) -> float:
+        """calculate_relevance_score on a chunk's fields, for callers that have
+        not built the chunk dict yet"""
+        signals = _content_signals(content)
         
         # Base score from semantic similarity (weight: 0.4)
         base_score = similarity * 0.4
         
         # Keyword matching score (weight: 0.3)
-        keyword_score = self._calculate_keyword_score(content, query_terms)
+        keyword_score = self._calculate_keyword_score(signals[0], query_terms)
         
         # Query type matching (weight: 0.2)
-        query_type_score = self._calculate_query_type_score(content, query)
+        query_type_score = self._calculate_query_type_score(signals, query)
         
         # Metadata boost (weight: 0.1)
         metadata_score = self._calculate_metadata_score(metadata, query_terms)
@@ -45,43 +87,33 @@ class Reranker:
         if not query_terms:
             return 0.0
         
-        matches = 0
-        for term in query_terms:
-            if term.lower() in content:
-                matches += 1
+        matches = sum(1 for term in query_terms if term.lower() in content)
         
-        return min(1.0, matches / len(query_terms)) if query_terms else 0.0
+        return min(1.0, matches / len(query_terms))
     
-    def _calculate_query_type_score(self, content: str, query: str) -> float:
+    def _calculate_query_type_score(self, signals: tuple, query: str) -> float:
         """Calculate score based on query type (price, deal, menu, etc.)"""
-        query_lower = query.lower()
+        is_price, is_deal, is_menu = _query_kinds(query)
+        _, has_price, has_price_word, has_deal_word, has_menu_field = signals
         score = 0.0
         
-        # Price queries - heavily boost chunks with actual prices
-        if any(kw in query_lower for kw in self.price_keywords):
-            # Check for actual price numbers (Rs. 123, Rs 123, etc.)
-            price_matches = re.findall(r'rs\.?\s*\d+', content, re.IGNORECASE)
-            if price_matches:
+        # Price queries - heavily boost chunks with actual prices (Rs. 123, Rs 123, etc.)
+        if is_price:
+            if has_price:
                 score += 1.0  # Strong boost for chunks with actual prices
-            elif any(kw in content for kw in ['rs.', 'rupee', 'price', 'cost']):
+            elif has_price_word:
                 score += 0.3  # Smaller boost for price-related keywords
         
         # Deal queries - boost chunks with deals AND prices
-        if any(kw in query_lower for kw in self.deal_keywords):
-            has_deal_keywords = any(kw in content for kw in self.deal_keywords)
-            has_combo = 'combo' in content or 'package' in content
-            has_prices = bool(re.search(r'rs\.?\s*\d+', content, re.IGNORECASE))
-            
-            if has_deal_keywords or has_combo:
-                score += 0.5
+        if is_deal and has_deal_word:
+            score += 0.5
             # Extra boost if deal chunk also has prices
-            if has_prices and (has_deal_keywords or has_combo):
+            if has_price:
                 score += 0.5
         
         # Menu queries
-        if any(kw in query_lower for kw in self.menu_keywords):
-            if any(kw in content for kw in ['name', 'description', 'item']):
-                score += 0.5
+        if is_menu and has_menu_field:
+            score += 0.5
         
         return min(1.0, score)
     
@@ -105,21 +137,25 @@ class Reranker:
         
         return min(1.0, score)
     
-    def rerank(self, chunks: List[Dict], query: str, query_terms: List[str]) -> List[Dict]:
-        """Re-rank chunks based on multiple signals"""
+    def rerank(self, chunks: List[Dict], query: str, query_terms: List[str],
+               top_k: Optional[int] = None, copy: bool = False) -> List[Dict]:
+        """
+        Re-rank chunks based on multiple signals; only the best top_k when given.
+        Writes 'rerank_score' into the given chunk dicts unless copy=True, for
+        callers that share their chunks
+        """
         if not chunks:
             return []
         
         # Calculate relevance scores
-        scored_chunks = []
-        for chunk in chunks:
-            relevance = self.calculate_relevance_score(chunk, query, query_terms)
-            chunk_copy = chunk.copy()
-            chunk_copy['rerank_score'] = relevance
-            scored_chunks.append(chunk_copy)
+        scored_chunks = [chunk.copy() for chunk in chunks] if copy else list(chunks)
+        for chunk in scored_chunks:
+            chunk['rerank_score'] = self.calculate_relevance_score(chunk, query, query_terms)
         
         # Sort by rerank score (descending)
-        scored_chunks.sort(key=lambda x: x['rerank_score'], reverse=True)
+        by_score = operator.itemgetter('rerank_score')
+        if top_k is not None:
+            return heapq.nlargest(top_k, scored_chunks, key=by_score)
+        scored_chunks.sort(key=by_score, reverse=True)
         
         return scored_chunks
-